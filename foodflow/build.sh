@@ -5,4 +5,6 @@ set -o errexit
 pip install -r requirements.txt
 
 python manage.py collectstatic --no-input
+# Avisa de estáticos sin hash o sin .gz/.br (no corta el build)
+python manage.py revisar_estaticos
 python manage.py migrate
\ No newline at end of file
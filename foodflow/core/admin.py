@@ -1,38 +1,201 @@
 from django.contrib import admin
-from .models import Mesa, Categoria, Producto, Pedido, DetallePedido, Venta
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.functional import cached_property
+from .models import (
+    Mesa, Estacion, Categoria, Producto, Pedido, DetallePedido, Venta, PedidoArchivado, DetalleArchivado,
+    VentaArchivada, ResumenVentas, Trabajo,
+)
+from . import services
+
+# --- Listas grandes (pedidos y ventas con cientos de miles de filas) ---
+
+# Sin filtros, un COUNT(*) recorre toda la tabla; en PostgreSQL usamos la estimación
+# que ya guarda el planificador (pg_class.reltuples). Con filtros, o en tablas chicas, se cuenta.
+class ConteoEstimadoPaginator(Paginator):
+    UMBRAL = 10000
+
+    @cached_property
+    def count(self):
+        consulta = self.object_list
+        conexion = connections[consulta.db]
+        if conexion.vendor == 'postgresql' and not consulta.query.where:
+            with conexion.cursor() as cursor:
+                cursor.execute(
+                    'SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass',
+                    [consulta.model._meta.db_table],
+                )
+                fila = cursor.fetchone()
+            # -1 si la tabla nunca se analizó
+            if fila and fila[0] > self.UMBRAL:
+                return fila[0]
+        return super().count
+
+class ListaGrandeMixin:
+    paginator = ConteoEstimadoPaginator
+    # Sin el segundo COUNT(*) de "N resultados (M en total)"
+    show_full_result_count = False
+
+# metodo_pago no tiene choices: el filtro normal haría un DISTINCT sobre toda la tabla.
+# Los métodos usados salen de ResumenVentas (una fila por hora y método).
+class MetodoPagoFilter(admin.SimpleListFilter):
+    title = 'método de pago'
+    parameter_name = 'metodo_pago'
+
+    def lookups(self, request, model_admin):
+        metodos = ResumenVentas.objects.values_list('metodo_pago', flat=True).distinct().order_by('metodo_pago')
+        return [(metodo, metodo.capitalize()) for metodo in metodos]
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(metodo_pago=self.value())
+        return queryset
+
+def _fin_prefijo(digitos):
+    # '0912' -> '0913', '09' -> '1' (con acarreo: '09:' no ordena igual con collations de
+    # PostgreSQL distintas de "C"); None si son todos 9
+    sin_nueves = digitos.rstrip('9')
+    if not sin_nueves:
+        return None
+    return sin_nueves[:-1] + str(int(sin_nueves[-1]) + 1)
+
+# Búsqueda de pedidos por número exacto o por cédula (completa o sus primeros dígitos).
+# El prefijo va como rango (>= '0912', < '0913') para que use pedido_cedula_idx en cualquier BD;
+# icontains recorría la tabla entera.
+class BusquedaPedidoMixin:
+    search_fields = ('cliente_cedula',)
+    search_help_text = 'Número de pedido o cédula (completa o los primeros dígitos)'
+
+    def get_search_results(self, request, queryset, search_term):
+        termino = search_term.strip().lstrip('#')
+        if not termino:
+            return queryset, False
+        if not termino.isdigit():
+            return queryset.filter(cliente_cedula=termino), False
+        fin = _fin_prefijo(termino)
+        if fin is None:
+            filtro = Q(cliente_cedula__startswith=termino)
+        else:
+            filtro = Q(cliente_cedula__gte=termino, cliente_cedula__lt=fin)
+        if len(termino) <= 10:
+            filtro |= Q(pk=int(termino))
+        return queryset.filter(filtro), False
+
+# Estaciones de cocina (cada una con su pantalla en /cocina/<slug>/)
+class EstacionAdmin(admin.ModelAdmin):
+    list_display = ('nombre', 'slug', 'orden')
+    prepopulated_fields = {'slug': ('nombre',)}
+
+class CategoriaAdmin(admin.ModelAdmin):
+    list_display = ('nombre', 'estacion')
+    list_filter = ('estacion',)
 
 # Configuración para Productos
 class ProductoAdmin(admin.ModelAdmin):
     list_display = ('nombre', 'categoria', 'precio', 'activo')
     list_filter = ('categoria',)
+    list_select_related = ('categoria',)
+    # Lo usa el autocompletado de los platos del pedido
+    search_fields = ('nombre',)
 
 # Esto permite ver los platos dentro del pedido
 class DetalleInline(admin.TabularInline):
     model = DetallePedido
     extra = 0
+    # Autocompletado en vez de un <select> con todo el menú en cada fila
+    autocomplete_fields = ('producto',)
+    # Los tickets los arma services al crear el pedido; un <select> listaría todos
+    readonly_fields = ('ticket',)
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('producto', 'ticket')
 
 # Configuración UNIFICADA para Pedidos
-class PedidoAdmin(admin.ModelAdmin):
+class PedidoAdmin(ListaGrandeMixin, BusquedaPedidoMixin, admin.ModelAdmin):
     # Columnas que se ven en la lista (incluida la cédula)
     list_display = ('id', 'mesa', 'cliente_cedula', 'metodo_pago', 'total', 'estado', 'creado_en')
+    list_select_related = ('mesa',)
     
-    # Filtros laterales
-    list_filter = ('estado', 'creado_en', 'metodo_pago')
-    
-    # Barra de búsqueda (puedes buscar por ID o por Cédula)
-    search_fields = ('cliente_cedula', 'id')
-    
+    # Filtros laterales; la fecha se navega por año/mes/día (pedido_creado_idx)
+    list_filter = ('estado', MetodoPagoFilter)
+    date_hierarchy = 'creado_en'
+
+    # Barra de búsqueda: ID o cédula (ver BusquedaPedidoMixin)
+
     # Platos dentro del pedido
     inlines = [DetalleInline]
 
+    # Si se editan los platos desde aquí, los totales guardados (y su Venta) se recalculan
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        services.recalcular_totales(form.instance)
+
 # Configuración para Ventas
-class VentaAdmin(admin.ModelAdmin):
+class VentaAdmin(ListaGrandeMixin, admin.ModelAdmin):
     list_display = ('id', 'pedido', 'total', 'metodo_pago', 'fecha_venta')
-    list_filter = ('fecha_venta', 'metodo_pago')
+    list_select_related = ('pedido',)
+    list_filter = (MetodoPagoFilter,)
+    date_hierarchy = 'fecha_venta'
+    search_fields = ('=pedido__id',)
+    # El formulario mostraría un <select> con todos los pedidos
+    raw_id_fields = ('pedido',)
+
+# Archivo histórico (core/archivo.py): solo consulta, ya está cobrado
+class SoloLecturaMixin:
+    def has_add_permission(self, request, obj=None):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+class DetalleArchivadoInline(SoloLecturaMixin, admin.TabularInline):
+    model = DetalleArchivado
+    extra = 0
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('producto')
+
+class PedidoArchivadoAdmin(SoloLecturaMixin, ListaGrandeMixin, BusquedaPedidoMixin, admin.ModelAdmin):
+    list_display = ('id', 'mesa_id', 'cliente_cedula', 'metodo_pago', 'total', 'creado_en')
+    list_filter = (MetodoPagoFilter,)
+    date_hierarchy = 'creado_en'
+    inlines = [DetalleArchivadoInline]
+
+class VentaArchivadaAdmin(SoloLecturaMixin, ListaGrandeMixin, admin.ModelAdmin):
+    list_display = ('id', 'pedido_id', 'total', 'metodo_pago', 'fecha_venta')
+    list_filter = (MetodoPagoFilter,)
+    date_hierarchy = 'fecha_venta'
+
+# Cola de trabajos (core/trabajos.py): se consulta y se reintentan los fallidos
+class TrabajoAdmin(admin.ModelAdmin):
+    list_display = ('id', 'tarea', 'estado', 'prioridad', 'intentos', 'ejecutar_en', 'terminado_en')
+    list_filter = ('estado', 'tarea')
+    search_fields = ('=clave',)
+    readonly_fields = [campo.name for campo in Trabajo._meta.fields]
+    actions = ['reintentar']
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+    @admin.action(description='Reintentar los trabajos seleccionados')
+    def reintentar(self, request, queryset):
+        reintentados = queryset.exclude(estado='en_curso').update(
+            estado='pendiente', intentos=0, error='', ejecutar_en=timezone.now(), terminado_en=None,
+        )
+        self.message_user(request, f'{reintentados} trabajos vuelven a la cola.')
 
 # --- REGISTROS FINALES (Solo una vez cada uno) ---
 admin.site.register(Mesa)
-admin.site.register(Categoria)
+admin.site.register(Estacion, EstacionAdmin)
+admin.site.register(Categoria, CategoriaAdmin)
 admin.site.register(Producto, ProductoAdmin)
 admin.site.register(Pedido, PedidoAdmin) # Aquí registramos el pedido con su admin
-admin.site.register(Venta, VentaAdmin)
\ No newline at end of file
+admin.site.register(Venta, VentaAdmin)
+admin.site.register(PedidoArchivado, PedidoArchivadoAdmin)
+admin.site.register(VentaArchivada, VentaArchivadaAdmin)
+admin.site.register(Trabajo, TrabajoAdmin)
@@ -0,0 +1,205 @@
+"""
+Analítica de ventas para gerencia sobre un rango de fechas locales.
+
+- Mezcla de productos y categorías: SUM en SQL agrupado por día y producto.
+- Mapa de calor día de la semana × hora y ticket promedio: salen de ``ResumenVentas``
+  (ya viene agregado por hora), en una sola consulta de como máximo 7 × 24 filas.
+- Tiempo de cocina (``listo_en - creado_en``): los segundos de cada pedido se traen
+  como columna (``array('d')``) para sacar promedio y percentiles.
+
+Con caché compartida (``FOODFLOW_CACHE_COMPARTIDA``) los parciales de cada día
+cerrado se guardan ahí; al pedir un año solo se consultan los días que faltan (en una
+sola pasada) y el día de hoy. Con la caché en memoria de cada proceso no se guardan:
+una edición tardía o un reembolso solo invalidaría el worker que lo atendió y los demás
+darían cifras viejas durante un mes. Cada pasada lee las tablas activas y las de
+archivo (core/archivo.py), que tienen los mismos campos.
+"""
+from array import array
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import DecimalField, DurationField, ExpressionWrapper, F, Sum
+from django.db.models.functions import Coalesce, ExtractIsoWeekDay, TruncDate
+from django.utils import timezone
+
+from . import services
+from .models import DetalleArchivado, DetallePedido, Pedido, PedidoArchivado, Producto, ResumenVentas
+from .reportes import ZONA, rango_fechas
+
+# Un día cerrado ya no cambia salvo ediciones en el admin (que lo invalidan)
+DURACION_DIA = 30 * 24 * 60 * 60
+DIAS_SEMANA = ['lunes', 'martes', 'miércoles', 'jueves', 'viernes', 'sábado', 'domingo']
+
+DINERO = DecimalField(max_digits=12, decimal_places=2)
+
+
+def _clave(fecha):
+    return f'foodflow:analitica:dia:{fecha.isoformat()}'
+
+
+def _dias(desde, hasta):
+    return [desde + timedelta(days=n) for n in range((hasta - desde).days + 1)]
+
+
+def _vacio():
+    return {'productos': {}, 'tiempos': array('d')}
+
+
+def calcular_parciales(desde, hasta):
+    """Parciales por día del rango: {fecha: {'productos': {id: [cantidad, ingreso]}, 'tiempos': array}}."""
+    inicio, fin = rango_fechas(desde, hasta)
+    parciales = {fecha: _vacio() for fecha in _dias(desde, hasta)}
+
+    for modelo in (DetallePedido, DetalleArchivado):
+        lineas = (
+            modelo.objects.filter(pedido__venta__fecha_venta__gte=inicio, pedido__venta__fecha_venta__lt=fin)
+            .annotate(dia=TruncDate('pedido__venta__fecha_venta', tzinfo=ZONA))
+            .values('dia', 'producto_id')
+            .annotate(
+                unidades=Sum('cantidad'),
+                ingreso=Sum(F('cantidad') * Coalesce('precio_unitario', 'producto__precio'), output_field=DINERO),
+            )
+            .order_by()
+        )
+        for fila in lineas:
+            acumulado = parciales[fila['dia']]['productos'].setdefault(fila['producto_id'], [0, Decimal('0')])
+            acumulado[0] += fila['unidades']
+            acumulado[1] += fila['ingreso']
+
+    for modelo in (Pedido, PedidoArchivado):
+        tiempos = (
+            modelo.objects.filter(creado_en__gte=inicio, creado_en__lt=fin, listo_en__isnull=False)
+            .annotate(
+                dia=TruncDate('creado_en', tzinfo=ZONA),
+                duracion=ExpressionWrapper(F('listo_en') - F('creado_en'), output_field=DurationField()),
+            )
+            .values_list('dia', 'duracion')
+            .order_by()
+        )
+        for dia, duracion in tiempos.iterator(chunk_size=5000):
+            parciales[dia]['tiempos'].append(duracion.total_seconds())
+    return parciales
+
+
+def obtener_parciales(desde, hasta):
+    """Toma de la caché los días cerrados y calcula el resto (una pasada por tramo de días seguidos)."""
+    if not settings.FOODFLOW_CACHE_COMPARTIDA:
+        return calcular_parciales(desde, hasta)
+    hoy = timezone.localdate()
+    dias = _dias(desde, hasta)
+    cerrados = [fecha for fecha in dias if fecha < hoy]
+
+    guardados = cache.get_many([_clave(fecha) for fecha in cerrados])
+    parciales = {fecha: guardados[_clave(fecha)] for fecha in cerrados if _clave(fecha) in guardados}
+
+    for desde_tramo, hasta_tramo in _tramos([fecha for fecha in dias if fecha not in parciales]):
+        nuevos = calcular_parciales(desde_tramo, hasta_tramo)
+        parciales.update(nuevos)
+        cache.set_many({_clave(fecha): parcial for fecha, parcial in nuevos.items() if fecha < hoy}, DURACION_DIA)
+    return parciales
+
+
+def _tramos(fechas):
+    # Días faltantes seguidos se consultan juntos: [1, 2, 3, 7, 8] -> (1, 3), (7, 8)
+    tramos = []
+    for fecha in fechas:
+        if tramos and fecha - tramos[-1][1] == timedelta(days=1):
+            tramos[-1][1] = fecha
+        else:
+            tramos.append([fecha, fecha])
+    return tramos
+
+
+def invalidar_dia(momento):
+    """Olvida el parcial cacheado del día (local) de ``momento``."""
+    cache.delete(_clave(timezone.localtime(momento, ZONA).date()))
+
+
+def _percentil(ordenados, p):
+    if not ordenados:
+        return None
+    return ordenados[min(len(ordenados) - 1, int(p / 100 * len(ordenados)))]
+
+
+def _minutos(segundos):
+    return None if segundos is None else round(segundos / 60, 1)
+
+
+def mapa_de_calor(desde, hasta):
+    """Ventas por día de la semana (lunes primero) × hora, desde el resumen por hora."""
+    filas = (
+        ResumenVentas.objects.filter(fecha__gte=desde, fecha__lte=hasta)
+        .annotate(dia_semana=ExtractIsoWeekDay('fecha'))
+        .values('dia_semana', 'hora')
+        .annotate(num_ventas=Sum('num_ventas'), total=Sum('total'))
+        .order_by()
+    )
+    mapa = [[Decimal('0.00')] * 24 for _ in DIAS_SEMANA]
+    num_ventas = 0
+    total = Decimal('0')
+    for fila in filas:
+        mapa[fila['dia_semana'] - 1][fila['hora']] += services.redondear(fila['total'])
+        num_ventas += fila['num_ventas']
+        total += fila['total']
+    return mapa, num_ventas, total
+
+
+def analizar(desde, hasta):
+    """Tablero completo del rango [desde, hasta] (fechas locales, ambas incluidas)."""
+    parciales = obtener_parciales(desde, hasta)
+
+    # Se juntan los parciales diarios
+    por_producto = {}
+    tiempos = array('d')
+    for parcial in parciales.values():
+        for producto_id, (cantidad, ingreso) in parcial['productos'].items():
+            acumulado = por_producto.setdefault(producto_id, [0, Decimal('0')])
+            acumulado[0] += cantidad
+            acumulado[1] += ingreso
+        tiempos.extend(parcial['tiempos'])
+
+    productos_info = Producto.objects.select_related('categoria').in_bulk(por_producto.keys())
+    productos = []
+    por_categoria = {}
+    for producto_id, (cantidad, ingreso) in por_producto.items():
+        producto = productos_info.get(producto_id)
+        categoria = producto.categoria.nombre if producto else 'Sin categoría'
+        productos.append({
+            'id': producto_id,
+            'nombre': producto.nombre if producto else f'Producto {producto_id}',
+            'categoria': categoria,
+            'cantidad': cantidad,
+            'ingreso': ingreso,
+        })
+        acumulado = por_categoria.setdefault(categoria, {'nombre': categoria, 'cantidad': 0, 'ingreso': Decimal('0')})
+        acumulado['cantidad'] += cantidad
+        acumulado['ingreso'] += ingreso
+    # SQLite no respeta la escala de los decimales calculados
+    for fila in productos + list(por_categoria.values()):
+        fila['ingreso'] = services.redondear(fila['ingreso'])
+    productos.sort(key=lambda p: p['ingreso'], reverse=True)
+    categorias = sorted(por_categoria.values(), key=lambda c: c['ingreso'], reverse=True)
+
+    mapa, num_ventas, total = mapa_de_calor(desde, hasta)
+    items = sum(p['cantidad'] for p in productos)
+    ordenados = sorted(tiempos)
+
+    return {
+        'desde': desde,
+        'hasta': hasta,
+        'num_ventas': num_ventas,
+        'total': services.redondear(total),
+        'ticket_promedio': services.redondear(total / num_ventas) if num_ventas else None,
+        'items_por_pedido': round(items / num_ventas, 2) if num_ventas else None,
+        'productos': productos,
+        'categorias': categorias,
+        'mapa_calor': {'dias': DIAS_SEMANA, 'horas': list(range(24)), 'totales': mapa},
+        'tiempo_cocina': {
+            'pedidos': len(ordenados),
+            'promedio_min': _minutos(sum(ordenados) / len(ordenados)) if ordenados else None,
+            'p50_min': _minutos(_percentil(ordenados, 50)),
+            'p90_min': _minutos(_percentil(ordenados, 90)),
+        },
+    }
@@ -1,5 +1,13 @@
 from django.apps import AppConfig
+from django.db.backends.signals import connection_created
 
 
 class CoreConfig(AppConfig):
     name = "core"
+
+    def ready(self):
+        from foodflowdatos.database import aplicar_pragmas
+
+        from . import signals  # noqa: F401
+
+        connection_created.connect(aplicar_pragmas, dispatch_uid='foodflow_pragmas_sqlite')
@@ -0,0 +1,99 @@
+"""
+Archivo de pedidos cobrados.
+
+Pedido, DetallePedido y Venta crecen sin parar y casi todo es historia ya cobrada.
+Los pedidos pagados hace más de ``FOODFLOW_ARCHIVO_DIAS`` se mueven (mismo id,
+mismos campos) a PedidoArchivado, DetalleArchivado y VentaArchivada, así cocina,
+cobro y admin trabajan sobre tablas chicas.
+
+Se mueve por lotes, cada uno en su transacción: si el proceso se corta, lo ya
+movido queda movido y la próxima corrida sigue donde quedó. Lo programa cada
+madrugada el worker de trabajos (core/tareas.py); también se puede correr a mano
+con ``manage.py archivar_pedidos``.
+
+El borrado de las tablas activas no pasa por señales: las ventas archivadas siguen
+contando en ResumenVentas y la analítica de esos días no cambia. Reportes,
+analítica y exportación leen las dos tablas (ver reportes, analitica y exportar).
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import (
+    ClaveIdempotencia, DetalleArchivado, DetallePedido, Pedido, PedidoArchivado, TicketEstacion, Venta,
+    VentaArchivada,
+)
+
+logger = logging.getLogger(__name__)
+
+TAMANO_LOTE = 500
+
+
+def _campos(modelo):
+    # Columnas que se copian tal cual (mesa_id, usuario_id...), sin las propias del archivo
+    return [campo.attname for campo in modelo._meta.concrete_fields if campo.name != 'archivado_en']
+
+
+def corte(dias=None):
+    dias = settings.FOODFLOW_ARCHIVO_DIAS if dias is None else dias
+    return timezone.now() - timedelta(days=dias)
+
+
+def por_archivar(limite):
+    # Usa pedido_estado_creado_idx; 'pagado' es un estado final, ya no cambia
+    return Pedido.objects.filter(estado='pagado', creado_en__lt=limite)
+
+
+def _borrar(modelo, columna, ids):
+    # DELETE directo, sin cargar filas ni mandar señales (ver docstring del módulo)
+    tabla = connection.ops.quote_name(modelo._meta.db_table)
+    marcas = ', '.join(['%s'] * len(ids))
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {tabla} WHERE {connection.ops.quote_name(columna)} IN ({marcas})', ids)
+        return cursor.rowcount
+
+
+def archivar_lote(limite, tamano=TAMANO_LOTE):
+    """Mueve al archivo hasta ``tamano`` pedidos (los más viejos). Devuelve cuántos movió."""
+    with transaction.atomic():
+        ids = list(
+            por_archivar(limite).select_for_update(skip_locked=True)
+            .order_by('id').values_list('id', flat=True)[:tamano]
+        )
+        if not ids:
+            return 0
+
+        PedidoArchivado.objects.bulk_create([
+            PedidoArchivado(**fila) for fila in Pedido.objects.filter(pk__in=ids).values(*_campos(PedidoArchivado))
+        ])
+        DetalleArchivado.objects.bulk_create([
+            DetalleArchivado(**fila)
+            for fila in DetallePedido.objects.filter(pedido_id__in=ids).values(*_campos(DetalleArchivado))
+        ], batch_size=1000)
+        VentaArchivada.objects.bulk_create([
+            VentaArchivada(**fila) for fila in Venta.objects.filter(pedido_id__in=ids).values(*_campos(VentaArchivada))
+        ])
+
+        ClaveIdempotencia.objects.filter(pedido_id__in=ids).update(pedido=None)
+        _borrar(DetallePedido, 'pedido_id', ids)
+        _borrar(TicketEstacion, 'pedido_id', ids)
+        _borrar(Venta, 'pedido_id', ids)
+        _borrar(Pedido, 'id', ids)
+    return len(ids)
+
+
+def archivar(dias=None, tamano=TAMANO_LOTE, max_lotes=None):
+    """Archiva lote por lote hasta terminar (o hasta ``max_lotes``). Devuelve el total movido."""
+    limite = corte(dias)
+    total = lotes = 0
+    while max_lotes is None or lotes < max_lotes:
+        movidos = archivar_lote(limite, tamano)
+        if not movidos:
+            break
+        total += movidos
+        lotes += 1
+        logger.info('Archivados %d pedidos (lote %d, %d en total)', movidos, lotes, total)
+    return total
@@ -0,0 +1,45 @@
+"""
+Usuario de la sesión leído desde la caché.
+
+AuthenticationMiddleware busca el usuario en la BD en cada petición. Con una caché
+compartida entre workers (``FOODFLOW_CACHE_COMPARTIDA``: redis, memcached o file) se
+guarda ahí; junto con la sesión ``cached_db``, una tablet ya no consulta la BD antes
+de llegar a la vista. Con la caché en memoria de cada proceso no se cachea: una
+invalidación solo llegaría al worker que la hizo y los demás seguirían aceptando un
+usuario desactivado o una contraseña vieja.
+
+Se invalida al confirmar la transacción que guarda o borra el usuario (cambio de
+contraseña, is_active, permisos) y al cerrar sesión; antes del commit otra petición
+podría volver a cachear la fila vieja. Como el usuario cacheado tiene la contraseña
+nueva, el hash de la sesión deja de coincidir y las sesiones viejas dejan de valer.
+"""
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+from django.db import transaction
+
+DURACION_USUARIO = 60 * 60
+
+
+def _clave(user_id):
+    return f'foodflow:usuario:{user_id}'
+
+
+class CacheModelBackend(ModelBackend):
+    """ModelBackend con ``get_user`` cacheado si la caché es compartida (el login sigue igual)."""
+
+    def get_user(self, user_id):
+        if not settings.FOODFLOW_CACHE_COMPARTIDA:
+            return super().get_user(user_id)
+        clave = _clave(user_id)
+        user = cache.get(clave)
+        if user is None:
+            user = super().get_user(user_id)
+            if user is None:
+                return None
+            cache.set(clave, user, DURACION_USUARIO)
+        return user if self.user_can_authenticate(user) else None
+
+
+def invalidar_usuario(user_id):
+    transaction.on_commit(lambda: cache.delete(_clave(user_id)))
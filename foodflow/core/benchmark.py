@@ -0,0 +1,237 @@
+"""
+Benchmark reproducible del flujo de pedidos.
+
+Siembra un restaurante con meses de historia, recorre los endpoints principales
+con el cliente de pruebas de Django en varios hilos y mide latencia (p50/p95/p99),
+throughput y consultas SQL por endpoint. Lo usa ``manage.py benchmark``.
+
+Cada hilo es un mesero con sus propias mesas: crea, marca listos y cobra solo sus
+pedidos, así que un error es un fallo real y no dos hilos pisándose la misma mesa.
+"""
+import json
+import random
+import threading
+import time
+from collections import Counter
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import Client
+from django.urls import reverse
+from django.utils import timezone
+
+from . import reportes, services
+from .models import Mesa, Categoria, Producto, Pedido, DetallePedido, Venta
+
+ENDPOINTS = ('crear_pedido', 'cocina', 'mesero', 'marcar_listo', 'reporte_ventas', 'analitica', 'procesar_pago')
+
+
+def sembrar_datos(mesas=30, productos=60, meses=3, pedidos_por_dia=60, semilla=42):
+    """Crea mesas, menú y la historia de pedidos/ventas con bulk_create (rápido y repetible)."""
+    azar = random.Random(semilla)
+
+    Mesa.objects.bulk_create([Mesa(numero=n) for n in range(1, mesas + 1)])
+    categorias = Categoria.objects.bulk_create(
+        [Categoria(nombre=n) for n in ('Hamburguesas', 'Platos', 'Bebidas', 'Postres', 'Entradas')]
+    )
+    Producto.objects.bulk_create([
+        Producto(
+            nombre=f'Producto {i}',
+            precio=Decimal(azar.randint(150, 1800)) / 100,
+            categoria=categorias[i % len(categorias)],
+            descripcion='Descripción de prueba',
+        )
+        for i in range(productos)
+    ])
+    lista_mesas = list(Mesa.objects.all())
+    lista_productos = list(Producto.objects.all())
+
+    ahora = timezone.now()
+    dias = meses * 30
+    momentos = [
+        ahora - timedelta(days=dia, minutes=azar.randint(0, 12 * 60))
+        for dia in range(dias, 0, -1)
+        for _ in range(pedidos_por_dia)
+    ]
+    pedidos = Pedido.objects.bulk_create(
+        [Pedido(mesa=azar.choice(lista_mesas), estado='pagado') for _ in momentos], batch_size=1000
+    )
+    # auto_now_add pisa creado_en en el insert: lo fijamos después con bulk_update
+    for pedido, momento in zip(pedidos, momentos):
+        pedido.creado_en = pedido.actualizado_en = momento
+        pedido.listo_en = momento + timedelta(minutes=azar.randint(5, 40))
+    Pedido.objects.bulk_update(pedidos, ['creado_en', 'actualizado_en', 'listo_en'], batch_size=1000)
+
+    detalles = []
+    ventas = []
+    for pedido in pedidos:
+        subtotal = Decimal('0')
+        for producto in azar.sample(lista_productos, azar.randint(1, 5)):
+            cantidad = azar.randint(1, 3)
+            subtotal += producto.precio * cantidad
+            detalles.append(DetallePedido(
+                pedido=pedido, producto=producto, cantidad=cantidad, precio_unitario=producto.precio
+            ))
+        pedido.subtotal, pedido.iva, pedido.total = services.calcular_totales(subtotal)
+        ventas.append(Venta(
+            pedido=pedido, total=pedido.total, fecha_venta=pedido.creado_en,
+            metodo_pago=azar.choice(['efectivo', 'tarjeta', 'transferencia']),
+        ))
+    DetallePedido.objects.bulk_create(detalles, batch_size=2000)
+    Pedido.objects.bulk_update(pedidos, ['subtotal', 'iva', 'total'], batch_size=1000)
+    Venta.objects.bulk_create(ventas, batch_size=2000)
+    # bulk_create no dispara señales: armamos los resúmenes de una vez
+    reportes.reconstruir_resumenes()
+
+    usuario = User.objects.create_superuser('benchmark', 'benchmark@foodflow.local', 'benchmark')
+    return {
+        'mesas': mesas, 'productos': productos, 'meses': meses,
+        'pedidos': len(pedidos), 'detalles': len(detalles), 'usuario': usuario.pk,
+    }
+
+
+def percentil(valores, p):
+    if not valores:
+        return None
+    ordenados = sorted(valores)
+    indice = max(0, min(len(ordenados) - 1, round(p / 100 * len(ordenados) + 0.5) - 1))
+    return ordenados[indice]
+
+
+class _Contador:
+    def __init__(self):
+        self.consultas = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.consultas += 1
+        return execute(sql, params, many, context)
+
+
+class Benchmark:
+    def __init__(self, usuario_id, iteraciones=200, concurrencia=8, semilla=42):
+        self.usuario = User.objects.get(pk=usuario_id)
+        self.iteraciones = iteraciones
+        self.concurrencia = concurrencia
+        self.azar = random.Random(semilla)
+        self.mesas = list(Mesa.objects.values_list('id', flat=True))
+        self.productos = list(Producto.objects.values_list('id', flat=True))
+        self.dias = sorted({timezone.localdate(v) for v in Venta.objects.values_list('fecha_venta', flat=True)[:5000]})
+        if len(self.mesas) < concurrencia:
+            raise ValueError(f'Hacen falta al menos {concurrencia} mesas (una por hilo), hay {len(self.mesas)}.')
+        # Pedidos creados y todavía no marcados listos, por hilo
+        self.pedidos_abiertos = [[] for _ in range(concurrencia)]
+        self._lock = threading.Lock()
+
+    # --- Una petición por endpoint ---
+    def _peticion(self, cliente, endpoint, azar, hilo):
+        mesas = self.mesas[hilo::self.concurrencia]
+        abiertos = self.pedidos_abiertos[hilo]
+        if endpoint == 'crear_pedido':
+            items = [{'id': p, 'cantidad': azar.randint(1, 3)} for p in azar.sample(self.productos, 4)]
+            cuerpo = {'mesa_id': azar.choice(mesas), 'items': items, 'metodo_pago': 'efectivo'}
+            respuesta = cliente.post(reverse('crear_pedido'), json.dumps(cuerpo), content_type='application/json')
+            if respuesta.status_code == 200:
+                abiertos.append(respuesta.json()['id_pedido'])
+            return respuesta
+        if endpoint == 'marcar_listo':
+            if not abiertos:
+                return None
+            return cliente.post(reverse('marcar_listo', args=[abiertos.pop()]))
+        if endpoint == 'reporte_ventas':
+            fecha = azar.choice(self.dias) if self.dias else timezone.localdate()
+            return cliente.get(reverse('reporte_ventas'), {'fecha': fecha.isoformat()})
+        if endpoint == 'analitica':
+            # Un año hasta un día al azar: con la caché por día solo el primero es frío
+            hasta = azar.choice(self.dias) if self.dias else timezone.localdate()
+            return cliente.get(reverse('analitica'), {'desde': (hasta - timedelta(days=364)).isoformat(), 'hasta': hasta.isoformat()})
+        if endpoint == 'procesar_pago':
+            return cliente.get(reverse('procesar_pago', args=[azar.choice(mesas)]))
+        return cliente.get(reverse(endpoint))
+
+    def _cliente(self):
+        # El login escribe la sesión: se hace antes de arrancar los hilos para no medir ese bloqueo
+        cliente = Client(raise_request_exception=False)
+        cliente.force_login(self.usuario)
+        return cliente
+
+    def _hilo(self, hilo, cliente, endpoint, cantidad, semilla, resultados):
+        azar = random.Random(semilla)
+        contador = _Contador()
+        try:
+            with connection.execute_wrapper(contador):
+                for _ in range(cantidad):
+                    antes = contador.consultas
+                    inicio = time.perf_counter()
+                    respuesta = self._peticion(cliente, endpoint, azar, hilo)
+                    duracion = time.perf_counter() - inicio
+                    if respuesta is None:
+                        continue
+                    with self._lock:
+                        resultados['latencias'].append(duracion)
+                        resultados['consultas'].append(contador.consultas - antes)
+                        if respuesta.status_code >= 400:
+                            resultados['errores'] += 1
+                            resultados['estados'][respuesta.status_code] += 1
+        finally:
+            connection.close()
+
+    def medir(self, endpoint):
+        resultados = {'latencias': [], 'consultas': [], 'errores': 0, 'estados': Counter()}
+        por_hilo = [self.iteraciones // self.concurrencia] * self.concurrencia
+        for i in range(self.iteraciones % self.concurrencia):
+            por_hilo[i] += 1
+
+        hilos = [
+            threading.Thread(
+                target=self._hilo, args=(hilo, self._cliente(), endpoint, cantidad, self.azar.random(), resultados)
+            )
+            for hilo, cantidad in enumerate(por_hilo) if cantidad
+        ]
+        inicio = time.perf_counter()
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+        duracion = time.perf_counter() - inicio
+
+        latencias = resultados['latencias']
+        consultas = resultados['consultas']
+        return {
+            'peticiones': len(latencias),
+            'errores': resultados['errores'],
+            # Códigos HTTP de los errores, para saber qué revisar
+            'errores_por_estado': {str(estado): n for estado, n in sorted(resultados['estados'].items())},
+            'p50_ms': _ms(percentil(latencias, 50)),
+            'p95_ms': _ms(percentil(latencias, 95)),
+            'p99_ms': _ms(percentil(latencias, 99)),
+            'throughput_rps': round(len(latencias) / duracion, 1) if duracion else None,
+            'consultas_promedio': round(sum(consultas) / len(consultas), 1) if consultas else None,
+            'consultas_max': max(consultas) if consultas else None,
+        }
+
+    def ejecutar(self, endpoints=ENDPOINTS):
+        return {endpoint: self.medir(endpoint) for endpoint in endpoints}
+
+
+def _ms(segundos):
+    return None if segundos is None else round(segundos * 1000, 2)
+
+
+def comparar(actual, base, tolerancia=0.25):
+    """Devuelve la lista de regresiones de ``actual`` contra la línea base."""
+    regresiones = []
+    for endpoint, datos in actual['endpoints'].items():
+        previo = base.get('endpoints', {}).get(endpoint)
+        if not previo:
+            continue
+        if (datos['consultas_max'] or 0) > (previo['consultas_max'] or 0):
+            regresiones.append(
+                f"{endpoint}: consultas máx {previo['consultas_max']} -> {datos['consultas_max']}"
+            )
+        if previo['p95_ms'] and datos['p95_ms'] and datos['p95_ms'] > previo['p95_ms'] * (1 + tolerancia):
+            regresiones.append(f"{endpoint}: p95 {previo['p95_ms']} ms -> {datos['p95_ms']} ms")
+        if datos['errores'] > previo['errores']:
+            regresiones.append(f"{endpoint}: errores {previo['errores']} -> {datos['errores']}")
+    return regresiones
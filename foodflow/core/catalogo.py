@@ -0,0 +1,55 @@
+from django.core.cache import cache
+from django.db.models import Prefetch
+
+from . import imagenes, versiones
+from .models import Categoria, Producto
+
+# La clave lleva la versión; la duración solo libera los menús viejos
+DURACION_CATALOGO = 60 * 60
+
+
+def construir_catalogo():
+    """Arma el menú activo completo en 2 consultas, listo para plantilla o JSON."""
+    activos = Producto.objects.filter(activo=True).order_by('nombre')
+    categorias = Categoria.objects.prefetch_related(
+        Prefetch('productos', queryset=activos)
+    ).order_by('id')
+
+    return [
+        {
+            'id': cat.id,
+            'nombre': cat.nombre,
+            'productos': [
+                {
+                    'id': prod.id,
+                    'nombre': prod.nombre,
+                    'precio': str(prod.precio),
+                    'descripcion': prod.descripcion or '',
+                    'imagen': prod.imagen.url if prod.imagen else '',
+                    # Miniaturas con srcset (vacío si todavía no se generaron)
+                    'miniatura': imagenes.datos_plantilla(prod.imagen_variantes),
+                }
+                for prod in cat.productos.all()
+            ],
+        }
+        for cat in categorias
+    ]
+
+
+def obtener_catalogo(version=None):
+    """
+    Devuelve el menú cacheado para la versión vigente:
+    {'version': int, 'modificado': datetime, 'categorias': [...]}.
+    ``version``: la que ya leyó la vista (ETag), para no volver a leerla.
+    """
+    version = version or versiones.obtener('catalogo')
+    clave = f"foodflow:catalogo:{version['numero']}"
+    categorias = cache.get(clave)
+    if categorias is None:
+        categorias = construir_catalogo()
+        cache.set(clave, categorias, DURACION_CATALOGO)
+    return {'version': version['numero'], 'modificado': version['modificado'], 'categorias': categorias}
+
+
+def invalidar_catalogo():
+    versiones.incrementar('catalogo')
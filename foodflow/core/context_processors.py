@@ -0,0 +1,8 @@
+from django.utils.functional import SimpleLazyObject
+
+from . import roles as roles_usuario
+
+
+def roles(request):
+    """Expone en las plantillas el conjunto de roles del usuario (``{% if 'Caja' in roles %}``)."""
+    return {'roles': SimpleLazyObject(lambda: roles_usuario.roles_de(request.user))}
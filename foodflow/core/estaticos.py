@@ -0,0 +1,194 @@
+"""
+Entrega de estáticos y media.
+
+Estáticos: ``collectstatic`` les pone el hash del contenido en el nombre
+(``mesero.3f2a9c1b7d4e.css``) y deja al lado la versión .gz y .br (Brotli, si el paquete
+está instalado). WhiteNoise sirve la comprimida que acepte el navegador y, como el
+nombre cambia con el contenido, manda caché "immutable" de 10 años.
+
+Media (fotos subidas): se sirven también en producción con :func:`servir`, que
+responde 304 (ETag / Last-Modified) y pedidos por rangos (206) para que una tablet con
+mala señal retome una descarga cortada. Las miniaturas llevan el hash en el nombre
+(core/imagenes.py) y van con caché de un año.
+
+``manage.py revisar_estaticos`` avisa de lo que quedó sin hash o sin comprimir.
+"""
+import mimetypes
+import re
+from pathlib import Path
+
+from django.apps import apps
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from whitenoise.compress import Compressor, brotli_installed
+from whitenoise.storage import CompressedManifestStaticFilesStorage
+
+CACHE_INMUTABLE = 'public, max-age=31536000, immutable'
+# Fotos originales: el nombre no cambia si se reemplaza el archivo; se revalidan con ETag
+CACHE_MEDIA = 'public, max-age=3600'
+
+RANGO = re.compile(r'^bytes=(\d*)-(\d*)$')
+# src/href a /static/... escritos a mano: se saltan el {% static %} y quedan sin hash
+ESTATICO_A_MANO = re.compile(r'''(?:src|href)\s*=\s*["']/?static/[^"'{]+["']''')
+
+
+class EstaticosStorage(CompressedManifestStaticFilesStorage):
+    """
+    Manifiesto con hash + compresión gzip/brotli de WhiteNoise.
+
+    Sin ``collectstatic`` (desarrollo, tests) o con un archivo nuevo que aún no se
+    recolectó, ``{% static %}`` devuelve el nombre sin hash en vez de un error 500.
+    """
+
+    manifest_strict = False
+
+    def stored_name(self, name):
+        try:
+            return super().stored_name(name)
+        except ValueError:
+            return name
+
+
+def _rango(cabecera, tamano):
+    """
+    (inicio, fin) de un ``Range: bytes=...`` de un solo tramo.
+    None si no se entiende (se responde el archivo completo), False si no se puede cumplir (416).
+    """
+    coincidencia = RANGO.match(cabecera.strip())
+    if not coincidencia:
+        return None
+    inicio, fin = coincidencia.groups()
+    if inicio == '':
+        if fin == '':
+            return None
+        # "bytes=-500": los últimos 500
+        ultimos = int(fin)
+        return (max(0, tamano - ultimos), tamano - 1) if ultimos and tamano else False
+    inicio = int(inicio)
+    if fin and int(fin) < inicio:
+        return None
+    if inicio >= tamano:
+        return False
+    return inicio, min(int(fin), tamano - 1) if fin else tamano - 1
+
+
+def _trozos(archivo, largo, bloque=FileResponse.block_size):
+    with archivo:
+        while largo > 0:
+            datos = archivo.read(min(bloque, largo))
+            if not datos:
+                break
+            largo -= len(datos)
+            yield datos
+
+
+def servir(request, ruta, raiz, cache_control=CACHE_MEDIA):
+    """Sirve ``raiz/ruta`` con ETag, Last-Modified, Range e If-Range."""
+    try:
+        completa = Path(safe_join(raiz, ruta))
+    except SuspiciousFileOperation:
+        raise Http404('Archivo no encontrado')
+    if not completa.is_file():
+        raise Http404('Archivo no encontrado')
+
+    estado = completa.stat()
+    tamano = estado.st_size
+    etag = f'"{estado.st_mtime_ns:x}-{tamano:x}"'
+    modificado = int(estado.st_mtime)
+    cabeceras = {
+        'ETag': etag,
+        'Last-Modified': http_date(modificado),
+        'Accept-Ranges': 'bytes',
+        'Cache-Control': cache_control,
+    }
+
+    # 304 Not Modified (o 412 si falla un If-Match)
+    condicional = get_conditional_response(request, etag=etag, last_modified=modificado)
+    if condicional is not None:
+        for nombre, valor in cabeceras.items():
+            condicional.headers.setdefault(nombre, valor)
+        return condicional
+
+    rango = None
+    if 'Range' in request.headers:
+        # If-Range: si el archivo cambió desde la descarga cortada, se manda entero
+        if_range = request.headers.get('If-Range')
+        if if_range is None or if_range == etag:
+            rango = _rango(request.headers['Range'], tamano)
+
+    tipo, codificacion = mimetypes.guess_type(completa)
+    tipo = tipo or 'application/octet-stream'
+    if rango is False:
+        respuesta = HttpResponse(status=416)
+        respuesta['Content-Range'] = f'bytes */{tamano}'
+    elif rango:
+        inicio, fin = rango
+        archivo = completa.open('rb')
+        archivo.seek(inicio)
+        respuesta = StreamingHttpResponse(_trozos(archivo, fin - inicio + 1), status=206, content_type=tipo)
+        respuesta['Content-Range'] = f'bytes {inicio}-{fin}/{tamano}'
+        respuesta['Content-Length'] = fin - inicio + 1
+    else:
+        respuesta = FileResponse(completa.open('rb'), content_type=tipo)
+    if codificacion and rango is not False:
+        respuesta['Content-Encoding'] = codificacion
+    for nombre, valor in cabeceras.items():
+        respuesta[nombre] = valor
+    return respuesta
+
+
+def _comprime_bien(compresor, ruta):
+    # Mismo criterio que WhiteNoise al comprimir: si no ahorra, no deja el .gz
+    datos = ruta.read_bytes()
+    return compresor.is_compressed_effectively('gzip', str(ruta), len(datos), compresor.compress_gzip(datos))
+
+
+def problemas():
+    """Lista de (tipo, detalle) con lo que no se entrega con hash o comprimido."""
+    raiz = Path(settings.STATIC_ROOT)
+    if not raiz.is_dir():
+        return [('sin_collectstatic', f'No existe {raiz}: falta correr collectstatic.')]
+
+    encontrados = []
+    # nombre original -> nombre con hash (vacío si el storage no usa manifiesto)
+    manifiesto = getattr(staticfiles_storage, 'hashed_files', {})
+    if not manifiesto:
+        encontrados.append(('sin_hash', 'No hay manifiesto de estáticos: ningún archivo lleva hash.'))
+
+    # Fuentes que collectstatic no llegó a procesar (agregadas después)
+    for finder in finders.get_finders():
+        for ruta, _ in finder.list(['CVS', '.*', '*~']):
+            if manifiesto and ruta.replace('\\', '/') not in manifiesto:
+                encontrados.append(('sin_hash', f'{ruta} no está en el manifiesto.'))
+
+    if not brotli_installed:
+        encontrados.append(('sin_brotli', 'El paquete Brotli no está instalado: solo se genera .gz.'))
+    compresor = Compressor(quiet=True)
+    for nombre in sorted(set(manifiesto.values())):
+        ruta = raiz / nombre
+        if not ruta.is_file() or not compresor.should_compress(nombre):
+            continue
+        faltan = [ext for ext in ('.gz', '.br') if not ruta.with_name(ruta.name + ext).exists()]
+        if not brotli_installed and '.br' in faltan:
+            faltan.remove('.br')
+        if faltan and _comprime_bien(compresor, ruta):
+            encontrados.append(('sin_comprimir', f'{nombre} sin {" ni ".join(faltan)}.'))
+
+    for carpeta in _carpetas_plantillas():
+        for plantilla in carpeta.rglob('*.html'):
+            for linea, texto in enumerate(plantilla.read_text(encoding='utf-8', errors='replace').splitlines(), 1):
+                if ESTATICO_A_MANO.search(texto):
+                    encontrados.append(('sin_hash', f'{plantilla}:{linea} usa /static/ a mano en vez de {{% static %}}.'))
+    return encontrados
+
+
+def _carpetas_plantillas():
+    carpetas = [Path(carpeta) for config in settings.TEMPLATES for carpeta in config.get('DIRS', [])]
+    carpetas += [Path(app.path) / 'templates' for app in apps.get_app_configs() if not app.name.startswith('django.')]
+    return [carpeta for carpeta in carpetas if carpeta.is_dir()]
@@ -0,0 +1,202 @@
+"""
+Canal de eventos en vivo para las pantallas de cocina y meseros.
+
+Las vistas publican con ``publicar('cocina', 'pedido', id=..., estado=...)`` y el
+endpoint SSE (``/api/eventos/``) reparte cada mensaje a las pantallas conectadas.
+
+El backend se elige con ``FOODFLOW_EVENTOS_BACKEND``:
+
+* ``core.eventos.MemoriaBackend`` (por defecto): todo dentro del mismo proceso.
+  Alcanza con un solo worker ASGI (lo que arranca start_asgi.sh por defecto); con
+  varios, un evento publicado en otro worker no llega.
+* ``core.eventos.PostgresBackend``: usa LISTEN/NOTIFY para que varios workers
+  compartan los eventos.
+
+El endpoint solo existe con :func:`disponible` (ASGI, y backend entre procesos o un
+solo worker): bajo WSGI cada pantalla conectada ocuparía un worker entero, y con
+varios workers en memoria las pantallas se quedan con el polling.
+"""
+import asyncio
+import json
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+CANALES = ('cocina', 'mesas')
+
+
+class BackendEventos:
+    """Interfaz mínima que debe cumplir un backend de eventos."""
+
+    # True si un evento publicado en un proceso llega a los suscriptores de los demás
+    entre_procesos = False
+
+    def publicar(self, mensaje):
+        raise NotImplementedError
+
+    def suscribir(self, canales):
+        """Devuelve un iterador asíncrono de mensajes de los canales pedidos."""
+        raise NotImplementedError
+
+
+class _Suscripcion:
+    def __init__(self, backend, canales, maximo):
+        self.backend = backend
+        self.canales = set(canales)
+        self.loop = asyncio.get_running_loop()
+        self.cola = asyncio.Queue(maxsize=maximo)
+
+    def entregar(self, mensaje):
+        # Se llama desde cualquier hilo: el put se hace en el loop del suscriptor
+        if mensaje['canal'] in self.canales:
+            self.loop.call_soon_threadsafe(self._poner, mensaje)
+
+    def _poner(self, mensaje):
+        try:
+            self.cola.put_nowait(mensaje)
+        except asyncio.QueueFull:
+            # Pantalla demasiado lenta: se pierde el evento, el polling de respaldo lo recupera
+            logger.warning('Cola de eventos llena, se descarta %s', mensaje['tipo'])
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        return await self.cola.get()
+
+    def cerrar(self):
+        self.backend._quitar(self)
+
+
+class MemoriaBackend(BackendEventos):
+    """Broker en memoria: reparte a los suscriptores del mismo proceso."""
+
+    MAXIMO_COLA = 100
+
+    def __init__(self):
+        self._suscripciones = set()
+        self._lock = threading.Lock()
+
+    def publicar(self, mensaje):
+        self._repartir(mensaje)
+
+    def _repartir(self, mensaje):
+        with self._lock:
+            suscripciones = list(self._suscripciones)
+        for suscripcion in suscripciones:
+            suscripcion.entregar(mensaje)
+
+    def suscribir(self, canales):
+        suscripcion = _Suscripcion(self, canales, self.MAXIMO_COLA)
+        with self._lock:
+            self._suscripciones.add(suscripcion)
+        return suscripcion
+
+    def _quitar(self, suscripcion):
+        with self._lock:
+            self._suscripciones.discard(suscripcion)
+
+
+class PostgresBackend(MemoriaBackend):
+    """
+    Comparte eventos entre workers con LISTEN/NOTIFY de PostgreSQL.
+    Cada proceso abre una sola conexión de escucha y reparte localmente.
+    """
+
+    CANAL_PG = 'foodflow_eventos'
+    entre_procesos = True
+
+    def __init__(self):
+        super().__init__()
+        self._escuchando = False
+
+    def publicar(self, mensaje):
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_notify(%s, %s)', [self.CANAL_PG, json.dumps(mensaje)])
+
+    def suscribir(self, canales):
+        self._iniciar_escucha()
+        return super().suscribir(canales)
+
+    def _iniciar_escucha(self):
+        with self._lock:
+            if self._escuchando:
+                return
+            self._escuchando = True
+        threading.Thread(target=self._escuchar, name='foodflow-eventos', daemon=True).start()
+
+    def _escuchar(self):
+        # Si la conexión se cae, reintentamos sin matar el hilo
+        while True:
+            try:
+                self._escuchar_conexion()
+            except Exception:
+                logger.exception('Se perdió la conexión LISTEN, reintentando')
+                time.sleep(5)
+
+    def _escuchar_conexion(self):
+        import psycopg
+
+        # Conexión propia fuera del pool de Django (queda abierta escuchando)
+        conexion = psycopg.connect(**connection.get_connection_params(), autocommit=True)
+        try:
+            conexion.execute(f'LISTEN {self.CANAL_PG}')
+            for aviso in conexion.notifies():
+                try:
+                    self._repartir(json.loads(aviso.payload))
+                except ValueError:
+                    logger.warning('Evento inválido recibido: %r', aviso.payload)
+        finally:
+            conexion.close()
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def _ruta_backend():
+    return getattr(settings, 'FOODFLOW_EVENTOS_BACKEND', 'core.eventos.MemoriaBackend')
+
+
+def disponible():
+    """True si se puede servir el canal en vivo: bajo ASGI, con un solo worker o un backend entre procesos."""
+    if not settings.FOODFLOW_ASGI:
+        return False
+    return settings.FOODFLOW_WORKERS == 1 or import_string(_ruta_backend()).entre_procesos
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = import_string(_ruta_backend())()
+    return _backend
+
+
+def publicar(canal, tipo, **datos):
+    """Publica un evento cuando la transacción actual se confirma (o de inmediato si no hay)."""
+    mensaje = {'canal': canal, 'tipo': tipo, **datos}
+
+    def enviar():
+        try:
+            get_backend().publicar(mensaje)
+        except Exception:
+            # Un fallo del canal en vivo nunca debe tumbar la operación principal
+            logger.exception('No se pudo publicar el evento %s', tipo)
+
+    transaction.on_commit(enviar)
+
+
+def publicar_pedido(pedido):
+    publicar('cocina', 'pedido', id=pedido.id, estado=pedido.estado)
+
+
+def publicar_mesa(mesa_id, estado):
+    publicar('mesas', 'mesa', id=mesa_id, estado=estado)
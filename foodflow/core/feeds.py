@@ -0,0 +1,198 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.db.models import OuterRef, Prefetch, Q, Subquery
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from .models import Mesa, Pedido, DetallePedido, TicketEstacion
+
+# Estados que la cocina todavía tiene que atender
+ESTADOS_COCINA = ('pendiente', 'problema')
+
+# Margen para no perder pedidos de transacciones que confirman un poco tarde:
+# lo que cambió en los últimos segundos se vuelve a enviar (el cliente reemplaza la tarjeta)
+MARGEN_CURSOR = timedelta(seconds=2)
+LIMITE_FEED = 200
+
+
+class CursorInvalido(ValueError):
+    pass
+
+
+def pedidos_cocina():
+    # Mesa, detalles y productos en 3 consultas, sin importar cuántos tickets haya
+    return Pedido.objects.select_related('mesa').prefetch_related(
+        Prefetch('detalles', queryset=DetallePedido.objects.select_related('producto').order_by('id'))
+    )
+
+
+def crear_cursor(momento, pedido_id=0):
+    micros = int(momento.timestamp() * 1_000_000)
+    return f"{micros}-{pedido_id}"
+
+
+def leer_cursor(cursor):
+    try:
+        micros, pedido_id = cursor.split('-')
+        momento = datetime.fromtimestamp(int(micros) / 1_000_000, tz=dt_timezone.utc)
+        return momento, int(pedido_id)
+    except (AttributeError, ValueError, OverflowError, OSError):
+        raise CursorInvalido(f'Cursor inválido: {cursor!r}')
+
+
+def serializar_pedido(pedido, request=None):
+    data = {
+        'id': pedido.id,
+        'mesa': pedido.mesa.numero,
+        'estado': pedido.estado,
+        'es_urgente': pedido.es_urgente,
+        'nota': pedido.nota_general or '',
+        'creado_en': pedido.creado_en.isoformat(),
+        'actualizado_en': pedido.actualizado_en.isoformat(),
+        'detalles': [
+            {'cantidad': d.cantidad, 'producto': d.producto.nombre, 'nota': d.nota or ''}
+            for d in pedido.detalles.all()
+        ],
+    }
+    if pedido.estado in ESTADOS_COCINA:
+        # La tarjeta ya renderizada, para que el JS no duplique la plantilla
+        data['html'] = render_to_string(
+            'cocina/ticket.html', {'pedido': pedido, 'detalles': pedido.detalles.all()}, request=request
+        )
+    return data
+
+
+def cursor_actual(consulta=None):
+    consulta = Pedido.objects.all() if consulta is None else consulta
+    ultimo = consulta.order_by('-actualizado_en', '-id').values_list('actualizado_en', 'id').first()
+    if ultimo is None:
+        return crear_cursor(timezone.now() - MARGEN_CURSOR)
+    return _limitar_cursor(*ultimo)
+
+
+def _limitar_cursor(momento, pedido_id):
+    # Nunca dejamos el cursor dentro del margen de seguridad
+    limite = timezone.now() - MARGEN_CURSOR
+    if momento > limite:
+        return crear_cursor(limite)
+    return crear_cursor(momento, pedido_id)
+
+
+def _feed(abiertos, todos, serializar, cursor, limite):
+    # Lógica común del monitor general y de las estaciones: mismo cursor (actualizado_en, id)
+    if not cursor:
+        return {
+            'cursor': cursor_actual(todos),
+            'completo': True,
+            'pedidos': [serializar(item) for item in abiertos.order_by('creado_en')],
+        }
+
+    momento, item_id = leer_cursor(cursor)
+    items = list(
+        todos.filter(Q(actualizado_en__gt=momento) | Q(actualizado_en=momento, id__gt=item_id))
+        .order_by('actualizado_en', 'id')[:limite]
+    )
+    if items:
+        nuevo_cursor = _limitar_cursor(items[-1].actualizado_en, items[-1].id)
+        # Si el margen nos hizo retroceder, no volvemos más atrás que el cursor recibido
+        if leer_cursor(nuevo_cursor) < (momento, item_id):
+            nuevo_cursor = cursor
+    else:
+        nuevo_cursor = cursor
+    return {
+        'cursor': nuevo_cursor,
+        'completo': len(items) < limite,
+        'pedidos': [serializar(item) for item in items],
+    }
+
+
+def feed_cocina(cursor=None, request=None, limite=LIMITE_FEED):
+    """
+    Sin cursor: todos los tickets abiertos (carga inicial de la pantalla).
+    Con cursor: solo los pedidos creados, terminados o marcados con problema desde entonces.
+    """
+    return _feed(
+        pedidos_cocina().filter(estado__in=ESTADOS_COCINA),
+        pedidos_cocina(),
+        lambda pedido: serializar_pedido(pedido, request),
+        cursor, limite,
+    )
+
+
+# --- Estaciones (parrilla, bar, postres...) ---
+# Cada pantalla solo carga sus propios tickets y las líneas que le tocan
+
+def tickets_estacion(estacion):
+    return TicketEstacion.objects.filter(estacion=estacion).select_related('pedido__mesa').prefetch_related(
+        Prefetch('detalles', queryset=DetallePedido.objects.select_related('producto').order_by('id'))
+    )
+
+
+def tickets_abiertos(estacion):
+    # Usa ticket_estacion_pendientes_idx; el pedido puede haberse cerrado desde el monitor general
+    return tickets_estacion(estacion).filter(estado='pendiente', pedido__estado__in=ESTADOS_COCINA)
+
+
+def serializar_ticket(ticket, request=None):
+    pedido = ticket.pedido
+    # Para la pantalla el "id" es el del pedido (una tarjeta por pedido y estación)
+    estado = pedido.estado if ticket.estado == 'pendiente' else 'listo'
+    data = {
+        'id': pedido.id,
+        'ticket': ticket.id,
+        'mesa': pedido.mesa.numero,
+        'estado': estado,
+        'es_urgente': pedido.es_urgente,
+        'nota': pedido.nota_general or '',
+        'creado_en': ticket.creado_en.isoformat(),
+        'actualizado_en': ticket.actualizado_en.isoformat(),
+        'detalles': [
+            {'cantidad': d.cantidad, 'producto': d.producto.nombre, 'nota': d.nota or ''}
+            for d in ticket.detalles.all()
+        ],
+    }
+    if estado in ESTADOS_COCINA:
+        data['html'] = render_to_string(
+            'cocina/ticket.html',
+            {'pedido': pedido, 'detalles': ticket.detalles.all(), 'ticket': ticket},
+            request=request,
+        )
+    return data
+
+
+def feed_estacion(estacion, cursor=None, request=None, limite=LIMITE_FEED):
+    return _feed(
+        tickets_abiertos(estacion),
+        tickets_estacion(estacion),
+        lambda ticket: serializar_ticket(ticket, request),
+        cursor, limite,
+    )
+
+
+def mesas_con_pedido():
+    """
+    Estado de todas las mesas en una sola consulta: por cada mesa, su pedido abierto
+    más reciente y desde cuándo tiene pedidos sin cobrar (subconsultas sobre
+    pedido_mesa_reciente_idx, sin traer los pedidos).
+    """
+    abiertos = Pedido.objects.filter(mesa=OuterRef('pk')).exclude(estado='pagado')
+    return Mesa.objects.order_by('numero').annotate(
+        pedido_abierto=Subquery(abiertos.order_by('-id').values('id')[:1]),
+        abierta_desde=Subquery(abiertos.order_by('id').values('creado_en')[:1]),
+    ).values('id', 'numero', 'estado', 'pedido_abierto', 'abierta_desde')
+
+
+def serializar_mesas(filas, version):
+    ahora = timezone.now()
+    mesas = []
+    for fila in filas:
+        desde = fila['abierta_desde']
+        mesas.append({
+            'id': fila['id'],
+            'numero': fila['numero'],
+            'estado': fila['estado'],
+            'pedido': fila['pedido_abierto'],
+            'desde': desde.isoformat() if desde else None,
+            'minutos': int((ahora - desde).total_seconds() // 60) if desde else None,
+        })
+    return {'version': version, 'mesas': mesas}
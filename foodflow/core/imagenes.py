@@ -0,0 +1,125 @@
+"""
+Miniaturas de las fotos de productos.
+
+Las fotos suben tal cual salen del celular (varios MB). De cada una se generan
+anchos fijos en WebP y JPEG, con el hash del contenido en el nombre:
+``productos/variantes/<hash>-320.webp``. Como el nombre cambia si cambia la foto,
+se pueden servir con caché "immutable" de un año.
+
+Se generan en segundo plano al guardar un Producto (señal + core/tareas.py) o con
+``manage.py generar_variantes``.
+"""
+import hashlib
+import logging
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+from . import catalogo
+from .models import Producto
+
+logger = logging.getLogger(__name__)
+
+ANCHOS = (160, 320, 640)
+CALIDAD = 80
+CARPETA = 'productos/variantes'
+# Tamaño que ocupa la foto en la tarjeta del menú (3 columnas en tablet, 2 en celular)
+SIZES = '(min-width: 768px) 30vw, 50vw'
+
+
+def _hash(contenido):
+    return hashlib.sha256(contenido).hexdigest()[:16]
+
+
+def _guardar(nombre, imagen, formato):
+    if default_storage.exists(nombre):
+        # Mismo contenido, mismo nombre: ya está generada
+        return nombre
+    buffer = BytesIO()
+    opciones = {'quality': CALIDAD}
+    if formato == 'WEBP':
+        opciones['method'] = 6
+    else:
+        opciones.update(optimize=True, progressive=True)
+    imagen.save(buffer, formato, **opciones)
+    return default_storage.save(nombre, ContentFile(buffer.getvalue()))
+
+
+def generar_variantes(archivo):
+    """
+    Genera las miniaturas de un archivo de imagen (FieldFile o similar) y devuelve
+    los datos que se guardan en ``Producto.imagen_variantes``.
+    """
+    archivo.open('rb')
+    try:
+        contenido = archivo.read()
+    finally:
+        archivo.close()
+    firma = _hash(contenido)
+
+    with Image.open(BytesIO(contenido)) as original:
+        # Las fotos del celular vienen giradas vía EXIF
+        original = ImageOps.exif_transpose(original).convert('RGB')
+        ancho_original, alto_original = original.size
+
+        variantes = []
+        anchos = [ancho for ancho in ANCHOS if ancho < ancho_original] or [ancho_original]
+        for ancho in anchos:
+            alto = round(alto_original * ancho / ancho_original)
+            reducida = original.resize((ancho, alto), Image.LANCZOS)
+            variantes.append({
+                'ancho': ancho,
+                'alto': alto,
+                'webp': _guardar(f'{CARPETA}/{firma}-{ancho}.webp', reducida, 'WEBP'),
+                'jpg': _guardar(f'{CARPETA}/{firma}-{ancho}.jpg', reducida, 'JPEG'),
+            })
+
+    return {'origen': archivo.name, 'hash': firma, 'variantes': variantes}
+
+
+def necesita_variantes(producto):
+    """True si la foto cambió (o se quitó) desde que se generaron las miniaturas."""
+    return producto.imagen_variantes.get('origen') != (producto.imagen.name or None)
+
+
+def actualizar_producto(producto, forzar=False):
+    """
+    Regenera las variantes si la imagen cambió. Devuelve True si hubo cambios.
+    Guarda con update() para no volver a disparar la señal post_save.
+    """
+    if not producto.imagen:
+        nuevas = {}
+    elif not forzar and producto.imagen_variantes.get('origen') == producto.imagen.name:
+        return False
+    else:
+        try:
+            nuevas = generar_variantes(producto.imagen)
+        except (OSError, ValueError, Image.DecompressionBombError):
+            logger.exception('No se pudieron generar las miniaturas de %s', producto.imagen.name)
+            return False
+
+    if nuevas == producto.imagen_variantes:
+        return False
+    producto.imagen_variantes = nuevas
+    Producto.objects.filter(pk=producto.pk).update(imagen_variantes=nuevas)
+    catalogo.invalidar_catalogo()
+    return True
+
+
+def datos_plantilla(variantes):
+    """URLs y srcset listos para el menú (o {} si el producto no tiene miniaturas)."""
+    if not variantes.get('variantes'):
+        return {}
+    lista = variantes['variantes']
+    # Para el src de respaldo y el width/height usamos la de 320 (o la más cercana)
+    base = min(lista, key=lambda v: abs(v['ancho'] - 320))
+    return {
+        'src': default_storage.url(base['jpg']),
+        'srcset': ', '.join(f"{default_storage.url(v['jpg'])} {v['ancho']}w" for v in lista),
+        'srcset_webp': ', '.join(f"{default_storage.url(v['webp'])} {v['ancho']}w" for v in lista),
+        'ancho': base['ancho'],
+        'alto': base['alto'],
+        'sizes': SIZES,
+    }
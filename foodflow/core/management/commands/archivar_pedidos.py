@@ -0,0 +1,23 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core import archivo
+
+
+class Command(BaseCommand):
+    help = (
+        "Mueve al archivo los pedidos pagados más viejos que FOODFLOW_ARCHIVO_DIAS, por lotes. "
+        "Se puede cortar y volver a correr: sigue donde quedó. Pensado para correr cada noche."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dias', type=int, default=None,
+            help=f'Antigüedad mínima en días (default: FOODFLOW_ARCHIVO_DIAS = {settings.FOODFLOW_ARCHIVO_DIAS}).',
+        )
+        parser.add_argument('--lote', type=int, default=archivo.TAMANO_LOTE, help='Pedidos por transacción.')
+        parser.add_argument('--max-lotes', type=int, default=None, help='Parar después de N lotes.')
+
+    def handle(self, *args, **options):
+        movidos = archivo.archivar(options['dias'], options['lote'], options['max_lotes'])
+        self.stdout.write(self.style.SUCCESS(f"{movidos} pedidos archivados."))
@@ -0,0 +1,124 @@
+import json
+import logging
+import os
+import platform
+import tempfile
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from core import benchmark
+
+
+class Command(BaseCommand):
+    help = (
+        "Corre el benchmark del flujo de pedidos sobre una base de datos de prueba nueva "
+        "(SQLite por defecto, o la base configurada si es PostgreSQL) y reporta p50/p95/p99, "
+        "throughput y consultas por endpoint."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrencia', type=int, default=8, help='Hilos simultáneos por endpoint.')
+        parser.add_argument('--iteraciones', type=int, default=200, help='Peticiones por endpoint.')
+        parser.add_argument('--meses', type=int, default=3, help='Meses de historia sembrados.')
+        parser.add_argument('--pedidos-por-dia', type=int, default=60)
+        parser.add_argument('--mesas', type=int, default=30)
+        parser.add_argument('--productos', type=int, default=60)
+        parser.add_argument('--semilla', type=int, default=42)
+        parser.add_argument('--endpoints', nargs='+', choices=benchmark.ENDPOINTS, default=list(benchmark.ENDPOINTS))
+        parser.add_argument('--guardar', metavar='ARCHIVO', help='Guarda el resultado en JSON (línea base).')
+        parser.add_argument('--comparar', metavar='ARCHIVO', help='Compara contra una línea base JSON.')
+        parser.add_argument('--tolerancia', type=float, default=0.25,
+                            help='Aumento de p95 permitido al comparar (0.25 = 25%%).')
+
+    def handle(self, *args, **options):
+        base = None
+        if options['comparar']:
+            with open(options['comparar']) as archivo:
+                base = json.load(archivo)
+
+        # Nunca tocamos la base real: se crea una base de prueba y se destruye al final
+        temporal = None
+        if connection.vendor == 'sqlite':
+            # En archivo (no en memoria) para que los hilos compartan datos sin bloquear la caché compartida
+            temporal = tempfile.NamedTemporaryFile(suffix='.sqlite3', delete=False)
+            temporal.close()
+            connection.settings_dict.setdefault('TEST', {})['NAME'] = temporal.name
+            # Solo en esta corrida: los hilos escriben a la vez y, con BEGIN diferido, SQLite
+            # corta con "database is locked" al pasar de leer a escribir (busy_timeout no
+            # cubre ese caso). Con IMMEDIATE cada transacción espera su turno al empezar.
+            connection.settings_dict.setdefault('OPTIONS', {})['transaction_mode'] = 'IMMEDIATE'
+        nombre_original = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+
+        # Los avisos de presupuesto por petición ensucian la salida; el resumen ya los refleja
+        logging.getLogger('core.rendimiento').setLevel(logging.ERROR)
+
+        try:
+            self.stdout.write('Sembrando datos...')
+            dataset = benchmark.sembrar_datos(
+                mesas=options['mesas'], productos=options['productos'], meses=options['meses'],
+                pedidos_por_dia=options['pedidos_por_dia'], semilla=options['semilla'],
+            )
+            usuario_id = dataset.pop('usuario')
+            self.stdout.write(f"{dataset['pedidos']} pedidos, {dataset['detalles']} detalles.")
+
+            corrida = benchmark.Benchmark(
+                usuario_id, iteraciones=options['iteraciones'],
+                concurrencia=options['concurrencia'], semilla=options['semilla'],
+            )
+            endpoints = {}
+            for endpoint in options['endpoints']:
+                endpoints[endpoint] = corrida.medir(endpoint)
+                self._imprimir(endpoint, endpoints[endpoint])
+        finally:
+            connection.creation.destroy_test_db(nombre_original, verbosity=0)
+            if temporal:
+                for sufijo in ('', '-wal', '-shm'):
+                    if os.path.exists(temporal.name + sufijo):
+                        os.remove(temporal.name + sufijo)
+
+        resultado = {
+            'meta': {
+                'fecha': timezone.now().isoformat(timespec='seconds'),
+                'motor': connection.vendor,
+                'python': platform.python_version(),
+                'debug': settings.DEBUG,
+                'concurrencia': options['concurrencia'],
+                'iteraciones': options['iteraciones'],
+                'dataset': dataset,
+            },
+            'endpoints': endpoints,
+        }
+
+        # Con errores la latencia no vale (un 500 rápido no es un pedido guardado): no se guarda
+        con_errores = {nombre: datos for nombre, datos in endpoints.items() if datos['errores']}
+        if con_errores:
+            for nombre, datos in con_errores.items():
+                self.stdout.write(self.style.ERROR(
+                    f"{nombre}: {datos['errores']} errores de {datos['peticiones']} ({datos['errores_por_estado']})"
+                ))
+            raise CommandError(f'{len(con_errores)} endpoints con errores: el resultado no es comparable.')
+
+        if options['guardar']:
+            with open(options['guardar'], 'w') as archivo:
+                json.dump(resultado, archivo, indent=2, ensure_ascii=False)
+                archivo.write('\n')
+            self.stdout.write(self.style.SUCCESS(f"Resultado guardado en {options['guardar']}"))
+
+        if base is not None:
+            regresiones = benchmark.comparar(resultado, base, options['tolerancia'])
+            if regresiones:
+                for regresion in regresiones:
+                    self.stdout.write(self.style.ERROR(regresion))
+                raise CommandError(f'{len(regresiones)} regresiones contra {options["comparar"]}')
+            self.stdout.write(self.style.SUCCESS('Sin regresiones contra la línea base.'))
+
+    def _imprimir(self, endpoint, datos):
+        self.stdout.write(
+            f"{endpoint:<16} n={datos['peticiones']:<5} p50={datos['p50_ms']}ms p95={datos['p95_ms']}ms "
+            f"p99={datos['p99_ms']}ms {datos['throughput_rps']} req/s "
+            f"consultas={datos['consultas_promedio']} (máx {datos['consultas_max']}) errores={datos['errores']}"
+        )
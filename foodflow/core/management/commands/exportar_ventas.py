@@ -0,0 +1,32 @@
+import sys
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core import exportar
+
+
+class Command(BaseCommand):
+    help = "Exporta las ventas (una línea por producto vendido) en CSV o NDJSON, sin cargarlas en memoria."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--desde', type=date.fromisoformat, required=True, help='Fecha inicial YYYY-MM-DD (incluida).')
+        parser.add_argument('--hasta', type=date.fromisoformat, help='Fecha final YYYY-MM-DD (incluida, default: --desde).')
+        parser.add_argument('--metodo', help='Solo un método de pago (efectivo, tarjeta, transferencia...).')
+        parser.add_argument('--formato', choices=sorted(exportar.FORMATOS), default='csv')
+        parser.add_argument('--salida', help='Archivo de salida (default: la consola).')
+
+    def handle(self, *args, **options):
+        desde = options['desde']
+        hasta = options['hasta'] or desde
+        if hasta < desde:
+            raise CommandError('--hasta no puede ser anterior a --desde.')
+
+        lineas = exportar.exportar(desde, hasta, options['metodo'], options['formato'])
+        salida = open(options['salida'], 'w', encoding='utf-8', newline='') if options['salida'] else sys.stdout
+        try:
+            for linea in lineas:
+                salida.write(linea)
+        finally:
+            if salida is not sys.stdout:
+                salida.close()
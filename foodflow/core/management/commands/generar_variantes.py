@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from core import imagenes
+from core.models import Producto
+
+
+class Command(BaseCommand):
+    help = "Genera las miniaturas WebP/JPEG de las fotos de productos que aún no las tienen."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--forzar', action='store_true',
+                            help='Regenera también las que ya existen (p. ej. tras cambiar los anchos).')
+
+    def handle(self, *args, **options):
+        generadas = 0
+        for producto in Producto.objects.exclude(imagen='').exclude(imagen__isnull=True).iterator():
+            if imagenes.actualizar_producto(producto, forzar=options['forzar']):
+                generadas += 1
+                self.stdout.write(f"  {producto.nombre}: {len(producto.imagen_variantes['variantes'])} tamaños")
+        self.stdout.write(self.style.SUCCESS(f"{generadas} productos actualizados."))
@@ -0,0 +1,45 @@
+import signal
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from core import tareas, trabajos
+
+
+class Command(BaseCommand):
+    help = "Worker de la cola de trabajos: resumen de ventas, miniaturas y archivo nocturno."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--una-vez', action='store_true',
+                            help='Ejecuta lo que esté listo y termina (para cron o pruebas).')
+        parser.add_argument('--espera', type=float, default=1.0,
+                            help='Segundos entre consultas cuando la cola está vacía (1 por defecto).')
+        parser.add_argument('--purgar-dias', type=int, default=7,
+                            help='Borra los trabajos hechos hace más de estos días (7 por defecto).')
+
+    def handle(self, *args, **options):
+        self.detener = False
+        # El deploy manda SIGTERM: se termina el trabajo en curso y se sale
+        signal.signal(signal.SIGTERM, self._detener)
+        signal.signal(signal.SIGINT, self._detener)
+
+        tareas.programar_archivo()
+        ultima_purga = 0
+        total = 0
+        while not self.detener:
+            # Conexión persistente del worker: respeta CONN_MAX_AGE y se reconecta si se cayó
+            close_old_connections()
+            corridos = trabajos.procesar(maximo=100)
+            total += corridos
+            if time.monotonic() - ultima_purga > 60 * 60:
+                trabajos.purgar(options['purgar_dias'])
+                ultima_purga = time.monotonic()
+            if options['una_vez'] and not corridos:
+                break
+            if not corridos:
+                time.sleep(options['espera'])
+        self.stdout.write(self.style.SUCCESS(f"{total} trabajos ejecutados."))
+
+    def _detener(self, *args):
+        self.detener = True
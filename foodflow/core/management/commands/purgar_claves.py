@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from core import services
+
+
+class Command(BaseCommand):
+    help = "Borra las claves de idempotencia viejas (ya ninguna tablet va a reintentar esos pedidos)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dias', type=int, default=7, help='Antigüedad mínima en días (default: 7).')
+
+    def handle(self, *args, **options):
+        borradas = services.purgar_claves(options['dias'])
+        self.stdout.write(self.style.SUCCESS(f"{borradas} claves borradas."))
@@ -0,0 +1,75 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core import services
+from core.models import DetallePedido, Pedido
+
+
+class Command(BaseCommand):
+    help = (
+        "Completa el precio guardado de los detalles antiguos y recalcula "
+        "subtotal/IVA/total de los pedidos. Con --verificar solo informa las diferencias."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verificar', action='store_true',
+                            help='No modifica nada, solo lista los pedidos con totales incorrectos.')
+        parser.add_argument('--lote', type=int, default=500,
+                            help='Pedidos procesados por transacción (default: 500).')
+
+    def handle(self, *args, **options):
+        verificar = options['verificar']
+        lote = options['lote']
+
+        sin_precio = DetallePedido.objects.filter(precio_unitario__isnull=True)
+        if verificar:
+            faltantes = sin_precio.count()
+            if faltantes:
+                self.stdout.write(self.style.WARNING(f"{faltantes} detalles sin precio guardado."))
+        else:
+            completados = services.completar_precios(DetallePedido.objects.all())
+            self.stdout.write(f"Precios completados en {completados} detalles.")
+
+        revisados = diferencias = ventas_distintas = 0
+        ultimo_id = 0
+        while True:
+            pedidos = list(
+                services.totales_calculados(Pedido.objects.filter(id__gt=ultimo_id))
+                .select_related('venta')
+                .order_by('id')[:lote]
+            )
+            if not pedidos:
+                break
+            ultimo_id = pedidos[-1].id
+
+            corregir = []
+            for pedido in pedidos:
+                revisados += 1
+                esperado = services.calcular_totales(pedido.subtotal_calculado)
+                if (pedido.subtotal, pedido.iva, pedido.total) != esperado:
+                    diferencias += 1
+                    if verificar:
+                        self.stdout.write(
+                            f"Pedido #{pedido.id}: guardado {pedido.total}, calculado {esperado[2]}"
+                        )
+                    pedido.subtotal, pedido.iva, pedido.total = esperado
+                    corregir.append(pedido)
+
+                # Las ventas ya cobradas no se tocan, solo se informan
+                venta = getattr(pedido, 'venta', None)
+                if venta is not None and venta.total != pedido.total:
+                    ventas_distintas += 1
+                    if verificar:
+                        self.stdout.write(
+                            f"Venta #{venta.id} (pedido #{pedido.id}): cobrado {venta.total}, pedido {pedido.total}"
+                        )
+
+            if corregir and not verificar:
+                with transaction.atomic():
+                    Pedido.objects.bulk_update(corregir, ['subtotal', 'iva', 'total'])
+
+        accion = "con diferencias" if verificar else "corregidos"
+        self.stdout.write(self.style.SUCCESS(
+            f"{revisados} pedidos revisados, {diferencias} {accion}, "
+            f"{ventas_distintas} ventas con monto distinto al pedido."
+        ))
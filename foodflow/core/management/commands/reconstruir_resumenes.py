@@ -0,0 +1,17 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand
+
+from core import reportes
+
+
+class Command(BaseCommand):
+    help = "Recalcula la tabla ResumenVentas a partir de las ventas (todo o un rango de fechas locales)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--desde', type=date.fromisoformat, help='Fecha inicial YYYY-MM-DD (incluida).')
+        parser.add_argument('--hasta', type=date.fromisoformat, help='Fecha final YYYY-MM-DD (incluida).')
+
+    def handle(self, *args, **options):
+        filas = reportes.reconstruir_resumenes(options['desde'], options['hasta'])
+        self.stdout.write(self.style.SUCCESS(f"{filas} filas de resumen generadas."))
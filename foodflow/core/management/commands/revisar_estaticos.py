@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core import estaticos
+
+
+class Command(BaseCommand):
+    help = "Revisa que los estáticos recolectados tengan hash en el nombre y versión .gz/.br."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--estricto', action='store_true',
+                            help='Termina con error si encuentra algo (para cortar el build).')
+
+    def handle(self, *args, **options):
+        encontrados = estaticos.problemas()
+        for tipo, detalle in encontrados:
+            self.stdout.write(self.style.WARNING(f"  [{tipo}] {detalle}"))
+        if not encontrados:
+            self.stdout.write(self.style.SUCCESS("Estáticos con hash y comprimidos."))
+        elif options['estricto']:
+            raise CommandError(f"{len(encontrados)} problemas en los estáticos.")
+        else:
+            self.stdout.write(f"{len(encontrados)} problemas en los estáticos.")
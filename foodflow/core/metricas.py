@@ -0,0 +1,84 @@
+"""
+Métricas de rendimiento por vista (consultas SQL, tiempo de BD, render y latencia).
+
+Se acumulan en memoria del proceso; cada worker expone las suyas en ``/metricas/``
+en formato de texto de Prometheus.
+"""
+import threading
+
+# Límites de los buckets del histograma de latencia, en segundos
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+
+
+class _MetricaVista:
+    __slots__ = ('peticiones', 'consultas', 'segundos_db', 'segundos_render', 'segundos_total', 'buckets')
+
+    def __init__(self):
+        self.peticiones = 0
+        self.consultas = 0
+        self.segundos_db = 0.0
+        self.segundos_render = 0.0
+        self.segundos_total = 0.0
+        self.buckets = [0] * len(BUCKETS)
+
+
+class RegistroMetricas:
+    def __init__(self):
+        self._vistas = {}
+        self._lock = threading.Lock()
+
+    def registrar(self, vista, consultas, segundos_db, segundos_render, segundos_total):
+        with self._lock:
+            metrica = self._vistas.get(vista)
+            if metrica is None:
+                metrica = self._vistas[vista] = _MetricaVista()
+            metrica.peticiones += 1
+            metrica.consultas += consultas
+            metrica.segundos_db += segundos_db
+            metrica.segundos_render += segundos_render
+            metrica.segundos_total += segundos_total
+            for i, limite in enumerate(BUCKETS):
+                if segundos_total <= limite:
+                    metrica.buckets[i] += 1
+
+    def limpiar(self):
+        with self._lock:
+            self._vistas.clear()
+
+    def como_prometheus(self):
+        with self._lock:
+            vistas = sorted(self._vistas.items())
+            lineas = [
+                '# HELP foodflow_peticiones_total Peticiones atendidas por vista.',
+                '# TYPE foodflow_peticiones_total counter',
+            ]
+            lineas += [f'foodflow_peticiones_total{{vista="{v}"}} {m.peticiones}' for v, m in vistas]
+            lineas += [
+                '# HELP foodflow_consultas_sql_total Consultas SQL ejecutadas por vista.',
+                '# TYPE foodflow_consultas_sql_total counter',
+            ]
+            lineas += [f'foodflow_consultas_sql_total{{vista="{v}"}} {m.consultas}' for v, m in vistas]
+            lineas += [
+                '# HELP foodflow_db_segundos_total Tiempo acumulado en la base de datos.',
+                '# TYPE foodflow_db_segundos_total counter',
+            ]
+            lineas += [f'foodflow_db_segundos_total{{vista="{v}"}} {m.segundos_db:.6f}' for v, m in vistas]
+            lineas += [
+                '# HELP foodflow_render_segundos_total Tiempo acumulado renderizando plantillas.',
+                '# TYPE foodflow_render_segundos_total counter',
+            ]
+            lineas += [f'foodflow_render_segundos_total{{vista="{v}"}} {m.segundos_render:.6f}' for v, m in vistas]
+            lineas += [
+                '# HELP foodflow_latencia_segundos Latencia total de la petición.',
+                '# TYPE foodflow_latencia_segundos histogram',
+            ]
+            for v, m in vistas:
+                for limite, cantidad in zip(BUCKETS, m.buckets):
+                    lineas.append(f'foodflow_latencia_segundos_bucket{{vista="{v}",le="{limite}"}} {cantidad}')
+                lineas.append(f'foodflow_latencia_segundos_bucket{{vista="{v}",le="+Inf"}} {m.peticiones}')
+                lineas.append(f'foodflow_latencia_segundos_sum{{vista="{v}"}} {m.segundos_total:.6f}')
+                lineas.append(f'foodflow_latencia_segundos_count{{vista="{v}"}} {m.peticiones}')
+        return '\n'.join(lineas) + '\n'
+
+
+registro = RegistroMetricas()
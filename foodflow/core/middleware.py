@@ -0,0 +1,194 @@
+import logging
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connection
+from django.http import FileResponse
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+from .metricas import registro
+
+logger = logging.getLogger('core.rendimiento')
+
+
+class _Medicion:
+    def __init__(self):
+        self.consultas = 0
+        self.segundos_db = 0.0
+        self.segundos_render = 0.0
+        self._inicio_render = None
+
+    def consulta(self, execute, sql, params, many, context):
+        # execute_wrapper: se llama alrededor de cada consulta SQL
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.consultas += 1
+            self.segundos_db += time.perf_counter() - inicio
+
+    def empezar_render(self):
+        self._inicio_render = time.perf_counter()
+
+    def terminar_render(self, response):
+        if self._inicio_render is not None:
+            self.segundos_render += time.perf_counter() - self._inicio_render
+        return response
+
+
+def _instalar_medicion(medicion):
+    connection.execute_wrappers.append(medicion.consulta)
+
+
+def _quitar_medicion(medicion):
+    connection.execute_wrappers.remove(medicion.consulta)
+
+
+class InstrumentacionMiddleware:
+    """
+    Mide por vista cuántas consultas hace, cuánto tarda la BD, el render y el total.
+
+    - Con DEBUG agrega las cabeceras X-FoodFlow-Consultas y Server-Timing.
+    - Siempre acumula los datos para ``/metricas/`` (formato Prometheus).
+    - Si la vista supera su presupuesto en ``FOODFLOW_PRESUPUESTOS`` deja un warning.
+
+    En las respuestas en streaming (exportación de ventas, eventos) las consultas se
+    hacen mientras se envía el cuerpo: se sigue midiendo hasta que termina y recién ahí
+    se registra. Los archivos (FileResponse) no consultan la BD y se registran al salir.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        medicion = _Medicion()
+        request._foodflow_medicion = medicion
+        inicio = time.perf_counter()
+
+        with connection.execute_wrapper(medicion.consulta):
+            response = self.get_response(request)
+
+        return self._terminar(request, response, medicion, inicio)
+
+    async def __acall__(self, request):
+        # Bajo ASGI el ORM corre en el hilo "sync" de la petición (sync_to_async):
+        # el execute_wrapper se pone en la conexión de ese hilo, no en la del event loop
+        medicion = _Medicion()
+        request._foodflow_medicion = medicion
+        inicio = time.perf_counter()
+
+        await sync_to_async(_instalar_medicion)(medicion)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(_quitar_medicion)(medicion)
+
+        return self._terminar(request, response, medicion, inicio)
+
+    def _terminar(self, request, response, medicion, inicio):
+        segundos_total = time.perf_counter() - inicio
+        if response.streaming and not isinstance(response, FileResponse):
+            if response.is_async:
+                response.streaming_content = self._medir_async(request, response.streaming_content, medicion, inicio)
+            else:
+                response.streaming_content = self._medir(request, response.streaming_content, medicion, inicio)
+        else:
+            self._registrar(request, medicion, segundos_total)
+
+        # Con streaming, las cabeceras solo cuentan lo hecho antes de empezar a enviar
+        if settings.DEBUG:
+            response['X-FoodFlow-Consultas'] = str(medicion.consultas)
+            response['Server-Timing'] = ', '.join([
+                f'db;dur={medicion.segundos_db * 1000:.1f};desc="{medicion.consultas} consultas"',
+                f'render;dur={medicion.segundos_render * 1000:.1f}',
+                f'total;dur={segundos_total * 1000:.1f}',
+            ])
+        return response
+
+    def _medir(self, request, contenido, medicion, inicio):
+        # El servidor recorre el cuerpo en un solo hilo: el de la conexión que consulta
+        try:
+            with connection.execute_wrapper(medicion.consulta):
+                yield from contenido
+        finally:
+            self._registrar(request, medicion, time.perf_counter() - inicio)
+
+    async def _medir_async(self, request, contenido, medicion, inicio):
+        # Como en __acall__: el ORM del cuerpo corre en el hilo "sync" de la petición
+        await sync_to_async(_instalar_medicion)(medicion)
+        try:
+            async for parte in contenido:
+                yield parte
+        finally:
+            await sync_to_async(_quitar_medicion)(medicion)
+            self._registrar(request, medicion, time.perf_counter() - inicio)
+
+    def _registrar(self, request, medicion, segundos_total):
+        vista = request.resolver_match.url_name if request.resolver_match else None
+        vista = vista or 'sin_nombre'
+        registro.registrar(
+            vista, medicion.consultas, medicion.segundos_db, medicion.segundos_render, segundos_total
+        )
+        self._revisar_presupuesto(request, vista, medicion, segundos_total)
+
+    def process_template_response(self, request, response):
+        # Django renderiza justo después de este hook: medimos hasta el callback post-render
+        medicion = getattr(request, '_foodflow_medicion', None)
+        if medicion is not None:
+            medicion.empezar_render()
+            response.add_post_render_callback(medicion.terminar_render)
+        return response
+
+    def _revisar_presupuesto(self, request, vista, medicion, segundos_total):
+        presupuesto = getattr(settings, 'FOODFLOW_PRESUPUESTOS', {}).get(vista)
+        if not presupuesto:
+            return
+        max_consultas = presupuesto.get('consultas')
+        max_ms = presupuesto.get('ms')
+        milisegundos = segundos_total * 1000
+        if (max_consultas is not None and medicion.consultas > max_consultas) or \
+                (max_ms is not None and milisegundos > max_ms):
+            logger.warning(
+                'Vista %s fuera de presupuesto: %d consultas (máx %s), %.1f ms (máx %s) en %s',
+                vista, medicion.consultas, max_consultas, milisegundos, max_ms, request.path,
+            )
+
+
+class EstaticosMiddleware(WhiteNoiseMiddleware):
+    """
+    WhiteNoise que también funciona en modo async.
+
+    WhiteNoiseMiddleware es solo síncrono: bajo uvicorn obliga a Django a pasar
+    cada petición por un hilo, aunque la vista sea async. Los estáticos se resuelven
+    igual (buscar en el diccionario y devolver el archivo); el resto sigue async.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, settings=settings):
+        super().__init__(get_response, settings)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            static_file = self.find_file(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return self.serve(static_file, request)
+        return await self.get_response(request)
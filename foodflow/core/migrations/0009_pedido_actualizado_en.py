@@ -0,0 +1,32 @@
+# Generated by Django 6.0 on 2026-10-18 08:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0008_pedido_cliente_cedula_pedido_metodo_pago_and_more"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="pedido",
+            name="actualizado_en",
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.AlterField(
+            model_name="pedido",
+            name="estado",
+            field=models.CharField(
+                choices=[
+                    ("pendiente", "Pendiente"),
+                    ("listo", "Listo"),
+                    ("problema", "Con Problema"),
+                    ("pagado", "Pagado"),
+                ],
+                default="pendiente",
+                max_length=20,
+            ),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 6.0 on 2026-10-18 08:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0009_pedido_actualizado_en"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="detallepedido",
+            name="precio_unitario",
+            field=models.DecimalField(
+                blank=True, decimal_places=2, max_digits=6, null=True
+            ),
+        ),
+        migrations.AddField(
+            model_name="pedido",
+            name="iva",
+            field=models.DecimalField(decimal_places=2, default=0.0, max_digits=10),
+        ),
+        migrations.AddField(
+            model_name="pedido",
+            name="subtotal",
+            field=models.DecimalField(decimal_places=2, default=0.0, max_digits=10),
+        ),
+    ]
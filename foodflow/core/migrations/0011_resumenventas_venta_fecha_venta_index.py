@@ -0,0 +1,83 @@
+# Generated by Django 6.0 on 2026-10-18 08:15
+
+from zoneinfo import ZoneInfo
+
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncHour
+
+
+def construir_resumenes(apps, schema_editor):
+    Venta = apps.get_model("core", "Venta")
+    ResumenVentas = apps.get_model("core", "ResumenVentas")
+    zona = ZoneInfo(settings.TIME_ZONE)
+
+    agrupadas = (
+        Venta.objects.annotate(hora_local=TruncHour("fecha_venta", tzinfo=zona))
+        .values("hora_local", "metodo_pago")
+        .annotate(num_ventas=Count("id"), suma=Sum("total"))
+        .order_by()
+    )
+    resumenes = []
+    for fila in agrupadas:
+        local = fila["hora_local"].astimezone(zona)
+        resumenes.append(
+            ResumenVentas(
+                fecha=local.date(),
+                hora=local.hour,
+                metodo_pago=fila["metodo_pago"],
+                num_ventas=fila["num_ventas"],
+                total=fila["suma"],
+            )
+        )
+    ResumenVentas.objects.bulk_create(resumenes, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0010_pedido_subtotal_iva_detallepedido_precio_unitario"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="venta",
+            name="fecha_venta",
+            field=models.DateTimeField(
+                db_index=True, default=django.utils.timezone.now
+            ),
+        ),
+        migrations.CreateModel(
+            name="ResumenVentas",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("fecha", models.DateField()),
+                ("hora", models.PositiveSmallIntegerField()),
+                ("metodo_pago", models.CharField(max_length=50)),
+                ("num_ventas", models.PositiveIntegerField(default=0)),
+                (
+                    "total",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=12),
+                ),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("fecha", "hora", "metodo_pago"),
+                        name="resumen_ventas_unico",
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(construir_resumenes, migrations.RunPython.noop),
+    ]
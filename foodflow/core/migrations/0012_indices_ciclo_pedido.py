@@ -0,0 +1,61 @@
+# Generated by Django 6.0 on 2026-10-18 08:17
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0011_resumenventas_venta_fecha_venta_index"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="pedido",
+            name="mesa",
+            field=models.ForeignKey(
+                db_index=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                to="core.mesa",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="venta",
+            name="fecha_venta",
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddIndex(
+            model_name="pedido",
+            index=models.Index(
+                condition=models.Q(
+                    ("estado__in", ["pendiente", "preparacion", "problema"])
+                ),
+                fields=["creado_en"],
+                name="pedido_cocina_abiertos_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="pedido",
+            index=models.Index(
+                fields=["estado", "creado_en"], name="pedido_estado_creado_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="pedido",
+            index=models.Index(fields=["mesa", "-id"], name="pedido_mesa_reciente_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="pedido",
+            index=models.Index(fields=["cliente_cedula"], name="pedido_cedula_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="venta",
+            index=models.Index(
+                fields=["fecha_venta", "metodo_pago"], name="venta_fecha_metodo_idx"
+            ),
+        ),
+    ]
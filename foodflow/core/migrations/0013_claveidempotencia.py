@@ -0,0 +1,41 @@
+# Generated by Django 6.0 on 2026-10-18 08:25
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0012_indices_ciclo_pedido"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ClaveIdempotencia",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("clave", models.CharField(max_length=64, unique=True)),
+                ("huella", models.CharField(max_length=64)),
+                ("respuesta", models.JSONField()),
+                ("creado_en", models.DateTimeField(auto_now_add=True, db_index=True)),
+                (
+                    "pedido",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        to="core.pedido",
+                    ),
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.0 on 2026-10-18 08:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0013_claveidempotencia"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="pedido",
+            name="listo_en",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
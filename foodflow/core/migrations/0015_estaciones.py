@@ -0,0 +1,119 @@
+# Generated by Django 6.0 on 2026-10-18 08:31
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0014_pedido_listo_en"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Estacion",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("nombre", models.CharField(max_length=50)),
+                ("slug", models.SlugField(unique=True)),
+                ("orden", models.PositiveSmallIntegerField(default=0)),
+            ],
+            options={
+                "verbose_name_plural": "estaciones",
+                "ordering": ["orden", "id"],
+            },
+        ),
+        migrations.AddField(
+            model_name="categoria",
+            name="estacion",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="categorias",
+                to="core.estacion",
+            ),
+        ),
+        migrations.CreateModel(
+            name="TicketEstacion",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "estado",
+                    models.CharField(
+                        choices=[("pendiente", "Pendiente"), ("listo", "Listo")],
+                        default="pendiente",
+                        max_length=20,
+                    ),
+                ),
+                ("creado_en", models.DateTimeField(auto_now_add=True)),
+                ("actualizado_en", models.DateTimeField(auto_now=True)),
+                ("listo_en", models.DateTimeField(blank=True, null=True)),
+                (
+                    "estacion",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="tickets",
+                        to="core.estacion",
+                    ),
+                ),
+                (
+                    "pedido",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="tickets",
+                        to="core.pedido",
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddField(
+            model_name="detallepedido",
+            name="ticket",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="detalles",
+                to="core.ticketestacion",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="ticketestacion",
+            index=models.Index(
+                condition=models.Q(("estado", "pendiente")),
+                fields=["estacion", "creado_en"],
+                name="ticket_estacion_pendientes_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="ticketestacion",
+            index=models.Index(
+                fields=["estacion", "actualizado_en"],
+                name="ticket_estacion_cambios_idx",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="ticketestacion",
+            constraint=models.UniqueConstraint(
+                fields=("pedido", "estacion"), name="ticket_pedido_estacion_unico"
+            ),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.0 on 2026-10-18 08:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0015_estaciones"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="producto",
+            name="imagen_variantes",
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
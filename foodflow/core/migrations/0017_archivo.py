@@ -0,0 +1,153 @@
+# Generated by Django 6.0 on 2026-10-18 08:41
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0016_producto_imagen_variantes"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PedidoArchivado",
+            fields=[
+                ("id", models.IntegerField(primary_key=True, serialize=False)),
+                ("creado_en", models.DateTimeField()),
+                ("actualizado_en", models.DateTimeField()),
+                (
+                    "estado",
+                    models.CharField(
+                        choices=[
+                            ("pendiente", "Pendiente"),
+                            ("listo", "Listo"),
+                            ("problema", "Con Problema"),
+                            ("pagado", "Pagado"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                ("listo_en", models.DateTimeField(blank=True, null=True)),
+                ("nota_general", models.TextField(blank=True, null=True)),
+                ("es_urgente", models.BooleanField(default=False)),
+                (
+                    "cliente_cedula",
+                    models.CharField(
+                        blank=True,
+                        max_length=13,
+                        null=True,
+                        verbose_name="Cédula Cliente",
+                    ),
+                ),
+                ("metodo_pago", models.CharField(default="efectivo", max_length=20)),
+                (
+                    "subtotal",
+                    models.DecimalField(decimal_places=2, default=0.0, max_digits=10),
+                ),
+                (
+                    "iva",
+                    models.DecimalField(decimal_places=2, default=0.0, max_digits=10),
+                ),
+                (
+                    "total",
+                    models.DecimalField(decimal_places=2, default=0.0, max_digits=10),
+                ),
+                ("archivado_en", models.DateTimeField(auto_now_add=True)),
+                (
+                    "mesa",
+                    models.ForeignKey(
+                        db_constraint=False,
+                        on_delete=django.db.models.deletion.DO_NOTHING,
+                        related_name="+",
+                        to="core.mesa",
+                    ),
+                ),
+                (
+                    "usuario",
+                    models.ForeignKey(
+                        blank=True,
+                        db_constraint=False,
+                        null=True,
+                        on_delete=django.db.models.deletion.DO_NOTHING,
+                        related_name="+",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name_plural": "pedidos archivados",
+            },
+        ),
+        migrations.CreateModel(
+            name="DetalleArchivado",
+            fields=[
+                ("id", models.IntegerField(primary_key=True, serialize=False)),
+                ("cantidad", models.IntegerField(default=1)),
+                (
+                    "precio_unitario",
+                    models.DecimalField(
+                        blank=True, decimal_places=2, max_digits=6, null=True
+                    ),
+                ),
+                ("nota", models.CharField(blank=True, max_length=200, null=True)),
+                (
+                    "producto",
+                    models.ForeignKey(
+                        db_constraint=False,
+                        on_delete=django.db.models.deletion.DO_NOTHING,
+                        related_name="+",
+                        to="core.producto",
+                    ),
+                ),
+                (
+                    "pedido",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="detalles",
+                        to="core.pedidoarchivado",
+                    ),
+                ),
+            ],
+        ),
+        migrations.CreateModel(
+            name="VentaArchivada",
+            fields=[
+                ("id", models.IntegerField(primary_key=True, serialize=False)),
+                ("fecha_venta", models.DateTimeField()),
+                ("total", models.DecimalField(decimal_places=2, max_digits=10)),
+                ("metodo_pago", models.CharField(default="efectivo", max_length=50)),
+                (
+                    "pedido",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="venta",
+                        to="core.pedidoarchivado",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name_plural": "ventas archivadas",
+            },
+        ),
+        migrations.AddIndex(
+            model_name="pedidoarchivado",
+            index=models.Index(fields=["creado_en"], name="pedido_arch_creado_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="pedidoarchivado",
+            index=models.Index(
+                fields=["cliente_cedula"], name="pedido_arch_cedula_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="ventaarchivada",
+            index=models.Index(
+                fields=["fecha_venta", "metodo_pago"],
+                name="venta_arch_fecha_metodo_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 6.0 on 2026-10-18 08:46
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0017_archivo"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="pedido",
+            index=models.Index(fields=["creado_en"], name="pedido_creado_idx"),
+        ),
+    ]
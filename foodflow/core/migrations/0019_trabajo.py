@@ -0,0 +1,81 @@
+# Generated by Django 6.0 on 2026-10-18 08:51
+
+import django.core.serializers.json
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0018_pedido_creado_idx"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Trabajo",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("tarea", models.CharField(max_length=100)),
+                (
+                    "argumentos",
+                    models.JSONField(
+                        default=dict,
+                        encoder=django.core.serializers.json.DjangoJSONEncoder,
+                    ),
+                ),
+                ("prioridad", models.SmallIntegerField(default=50)),
+                (
+                    "clave",
+                    models.CharField(
+                        blank=True, max_length=200, null=True, unique=True
+                    ),
+                ),
+                (
+                    "estado",
+                    models.CharField(
+                        choices=[
+                            ("pendiente", "Pendiente"),
+                            ("en_curso", "En curso"),
+                            ("hecho", "Hecho"),
+                            ("fallido", "Fallido"),
+                        ],
+                        default="pendiente",
+                        max_length=20,
+                    ),
+                ),
+                ("intentos", models.PositiveSmallIntegerField(default=0)),
+                ("max_intentos", models.PositiveSmallIntegerField(default=5)),
+                (
+                    "ejecutar_en",
+                    models.DateTimeField(default=django.utils.timezone.now),
+                ),
+                ("bloqueado_hasta", models.DateTimeField(blank=True, null=True)),
+                ("error", models.TextField(blank=True)),
+                ("creado_en", models.DateTimeField(auto_now_add=True)),
+                ("terminado_en", models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        condition=models.Q(("estado", "pendiente")),
+                        fields=["prioridad", "ejecutar_en"],
+                        name="trabajo_pendientes_idx",
+                    ),
+                    models.Index(
+                        condition=models.Q(("estado", "en_curso")),
+                        fields=["bloqueado_hasta"],
+                        name="trabajo_en_curso_idx",
+                    ),
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 6.0 on 2026-10-18 09:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0019_trabajo"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Version",
+            fields=[
+                (
+                    "nombre",
+                    models.CharField(max_length=30, primary_key=True, serialize=False),
+                ),
+                ("numero", models.BigIntegerField()),
+                ("modificado", models.DateTimeField()),
+            ],
+        ),
+    ]
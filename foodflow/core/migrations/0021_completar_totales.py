@@ -0,0 +1,66 @@
+# Generated by Django 6.0 on 2026-10-18 09:20
+
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.db import migrations
+from django.db.models import DecimalField, F, OuterRef, Subquery, Sum
+
+# Copia de services.IVA al momento de la migración (si cambia, estos pedidos ya se cobraron con esta)
+IVA = Decimal("0.15")
+CENTAVOS = Decimal("0.01")
+LOTE = 500
+
+
+def completar_totales(apps, schema_editor):
+    """
+    Pedidos anteriores a 0010 quedaron con subtotal/iva/total en 0: al cobrarlos,
+    cobrar_mesa crearía ventas en 0. Se calculan desde sus detalles.
+    """
+    Pedido = apps.get_model("core", "Pedido")
+    DetallePedido = apps.get_model("core", "DetallePedido")
+    Producto = apps.get_model("core", "Producto")
+
+    DetallePedido.objects.filter(precio_unitario__isnull=True).update(
+        precio_unitario=Subquery(
+            Producto.objects.filter(pk=OuterRef("producto_id")).values("precio")[:1]
+        )
+    )
+
+    ultimo_id = 0
+    while True:
+        pedidos = list(
+            Pedido.objects.filter(total=0, id__gt=ultimo_id)
+            .annotate(
+                subtotal_calculado=Sum(
+                    F("detalles__cantidad") * F("detalles__precio_unitario"),
+                    output_field=DecimalField(max_digits=12, decimal_places=2),
+                )
+            )
+            .order_by("id")[:LOTE]
+        )
+        if not pedidos:
+            break
+        ultimo_id = pedidos[-1].id
+
+        corregir = []
+        for pedido in pedidos:
+            if not pedido.subtotal_calculado:
+                continue
+            subtotal = pedido.subtotal_calculado.quantize(
+                CENTAVOS, rounding=ROUND_HALF_UP
+            )
+            iva = (subtotal * IVA).quantize(CENTAVOS, rounding=ROUND_HALF_UP)
+            pedido.subtotal, pedido.iva, pedido.total = subtotal, iva, subtotal + iva
+            corregir.append(pedido)
+        Pedido.objects.bulk_update(corregir, ["subtotal", "iva", "total"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0020_version"),
+    ]
+
+    operations = [
+        migrations.RunPython(completar_totales, migrations.RunPython.noop),
+    ]
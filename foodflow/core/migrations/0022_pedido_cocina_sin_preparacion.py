@@ -0,0 +1,27 @@
+# Generated by Django 6.0 on 2026-10-18 09:06
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0021_completar_totales"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="pedido",
+            name="pedido_cocina_abiertos_idx",
+        ),
+        migrations.AddIndex(
+            model_name="pedido",
+            index=models.Index(
+                condition=models.Q(("estado__in", ["pendiente", "problema"])),
+                fields=["creado_en"],
+                name="pedido_cocina_abiertos_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 6.0 on 2026-10-18 09:08
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0022_pedido_cocina_sin_preparacion"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="detallearchivado",
+            name="producto",
+            field=models.ForeignKey(
+                db_constraint=False,
+                null=True,
+                on_delete=django.db.models.deletion.DO_NOTHING,
+                related_name="+",
+                to="core.producto",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="pedidoarchivado",
+            name="mesa",
+            field=models.ForeignKey(
+                db_constraint=False,
+                null=True,
+                on_delete=django.db.models.deletion.DO_NOTHING,
+                related_name="+",
+                to="core.mesa",
+            ),
+        ),
+    ]
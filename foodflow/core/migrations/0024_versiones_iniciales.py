@@ -0,0 +1,31 @@
+# Generated by Django 6.0 on 2026-10-18 10:05
+
+import time
+
+from django.db import migrations
+from django.utils import timezone
+
+# Las que leen las vistas (core/versiones.py): sin fila, la primera petición de cada
+# worker la crea con get_or_create (4 consultas más en el mapa de mesas y el menú)
+NOMBRES = ("catalogo", "mesas", "roles")
+
+
+def crear_versiones(apps, schema_editor):
+    Version = apps.get_model("core", "Version")
+    numero = time.time_ns() // 1000
+    modificado = timezone.now().replace(microsecond=0)
+    Version.objects.bulk_create(
+        [Version(nombre=nombre, numero=numero, modificado=modificado) for nombre in NOMBRES],
+        ignore_conflicts=True,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0023_archivo_mesa_producto_opcionales"),
+    ]
+
+    operations = [
+        migrations.RunPython(crear_versiones, migrations.RunPython.noop),
+    ]
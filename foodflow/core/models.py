@@ -1,3 +1,4 @@
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
 from django.utils import timezone
 from django.contrib.auth.models import User
@@ -17,8 +18,23 @@ class Mesa(models.Model):
     def __str__(self):
         return f"Mesa {self.numero}"
 
+class Estacion(models.Model):
+    # Parrilla, bar, postres... cada una con su pantalla en /cocina/<slug>/
+    nombre = models.CharField(max_length=50)
+    slug = models.SlugField(unique=True)
+    # La primera (menor orden) recibe los productos de categorías sin estación
+    orden = models.PositiveSmallIntegerField(default=0)
+
+    class Meta:
+        ordering = ['orden', 'id']
+        verbose_name_plural = 'estaciones'
+
+    def __str__(self):
+        return self.nombre
+
 class Categoria(models.Model):
     nombre = models.CharField(max_length=50)
+    estacion = models.ForeignKey(Estacion, on_delete=models.SET_NULL, null=True, blank=True, related_name='categorias')
     def __str__(self): return self.nombre
 
 class Producto(models.Model):
@@ -32,6 +48,8 @@ class Producto(models.Model):
     # upload_to='productos/' creará una carpeta automática para organizar las fotos
     imagen = models.ImageField(upload_to='productos/', null=True, blank=True)
     # --------------------------------------------
+    # Miniaturas WebP/JPEG generadas a partir de la imagen (ver core/imagenes.py)
+    imagen_variantes = models.JSONField(default=dict, blank=True, editable=False)
 
     def __str__(self):
         return f"{self.nombre} (${self.precio})"
@@ -40,27 +58,88 @@ class Pedido(models.Model):
     ESTADOS_PEDIDO = [
         ('pendiente', 'Pendiente'),
         ('listo', 'Listo'),
+        ('problema', 'Con Problema'),
+        ('pagado', 'Pagado'),
     ]
-    mesa = models.ForeignKey(Mesa, on_delete=models.CASCADE)
+    # El índice de mesa lo cubre pedido_mesa_reciente_idx (mesa, -id)
+    mesa = models.ForeignKey(Mesa, on_delete=models.CASCADE, db_index=False)
     creado_en = models.DateTimeField(auto_now_add=True)
+    # Cambia con cada save(): el feed de cocina lo usa como cursor
+    actualizado_en = models.DateTimeField(auto_now=True, db_index=True)
     estado = models.CharField(max_length=20, choices=ESTADOS_PEDIDO, default='pendiente')
+    # Cuándo la cocina lo marcó listo (tiempo de cocina en core/analitica.py)
+    listo_en = models.DateTimeField(null=True, blank=True)
     nota_general = models.TextField(blank=True, null=True)
     es_urgente = models.BooleanField(default=False) 
     usuario = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
     cliente_cedula = models.CharField(max_length=13, blank=True, null=True, verbose_name="Cédula Cliente")
     metodo_pago = models.CharField(max_length=20, default='efectivo')
+    # Totales guardados al crear el pedido (ver services.recalcular_totales)
+    subtotal = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
+    iva = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
     total = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
 
+    class Meta:
+        indexes = [
+            # Pantalla de cocina: solo los pedidos abiertos, en orden de llegada
+            models.Index(
+                fields=['creado_en'],
+                condition=models.Q(estado__in=['pendiente', 'problema']),
+                name='pedido_cocina_abiertos_idx',
+            ),
+            # Filtros por estado + fecha (admin, reportes)
+            models.Index(fields=['estado', 'creado_en'], name='pedido_estado_creado_idx'),
+            # Navegación por fecha del admin (date_hierarchy) sin filtrar por estado
+            models.Index(fields=['creado_en'], name='pedido_creado_idx'),
+            # Último pedido de una mesa (cobro)
+            models.Index(fields=['mesa', '-id'], name='pedido_mesa_reciente_idx'),
+            # Búsqueda exacta o por prefijo de cédula (el prefijo se consulta como rango, ver admin)
+            models.Index(fields=['cliente_cedula'], name='pedido_cedula_idx'),
+        ]
+
     @property
     def total_pedido(self):
-        # Esta función suma todos los detalles del pedido automáticamente
-        total = sum(item.producto.precio * item.cantidad for item in self.detalles.all())
-        return total
+        # Antes sumaba los detalles en cada acceso; ahora el total ya está guardado
+        return self.total
+
+class TicketEstacion(models.Model):
+    # La parte de un pedido que le toca a una estación (se crea junto con el pedido)
+    ESTADOS = [
+        ('pendiente', 'Pendiente'),
+        ('listo', 'Listo'),
+    ]
+    pedido = models.ForeignKey(Pedido, on_delete=models.CASCADE, related_name='tickets')
+    estacion = models.ForeignKey(Estacion, on_delete=models.CASCADE, related_name='tickets')
+    estado = models.CharField(max_length=20, choices=ESTADOS, default='pendiente')
+    creado_en = models.DateTimeField(auto_now_add=True)
+    actualizado_en = models.DateTimeField(auto_now=True)
+    listo_en = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['pedido', 'estacion'], name='ticket_pedido_estacion_unico'),
+        ]
+        indexes = [
+            # Cola de cada pantalla: solo sus tickets pendientes, en orden de llegada
+            models.Index(
+                fields=['estacion', 'creado_en'],
+                condition=models.Q(estado='pendiente'),
+                name='ticket_estacion_pendientes_idx',
+            ),
+            # Feed incremental de la estación (cursor actualizado_en + id)
+            models.Index(fields=['estacion', 'actualizado_en'], name='ticket_estacion_cambios_idx'),
+        ]
+
+    def __str__(self):
+        return f"Pedido #{self.pedido_id} - {self.estacion_id}"
 
 class DetallePedido(models.Model):
     pedido = models.ForeignKey(Pedido, on_delete=models.CASCADE, related_name='detalles')
+    ticket = models.ForeignKey(TicketEstacion, on_delete=models.SET_NULL, null=True, blank=True, related_name='detalles')
     producto = models.ForeignKey(Producto, on_delete=models.CASCADE)
     cantidad = models.IntegerField(default=1)
+    # Precio del producto al momento del pedido (si luego cambia el menú, el pedido no cambia)
+    precio_unitario = models.DecimalField(max_digits=6, decimal_places=2, null=True, blank=True)
     nota = models.CharField(max_length=200, blank=True, null=True)
 
 class Venta(models.Model):
@@ -69,7 +148,166 @@ class Venta(models.Model):
     total = models.DecimalField(max_digits=10, decimal_places=2)
     # AGREGA ESTE CAMPO NUEVO:
     metodo_pago = models.CharField(max_length=50, default='efectivo') 
+
+    class Meta:
+        indexes = [
+            # Rangos de fecha del reporte y filtros del admin por fecha + método de pago
+            models.Index(fields=['fecha_venta', 'metodo_pago'], name='venta_fecha_metodo_idx'),
+        ]
     
     def __str__(self):
         return f"Venta #{self.id} - {self.total}"
-    
\ No newline at end of file
+
+
+class ResumenVentas(models.Model):
+    # Totales por hora local (America/Guayaquil) y método de pago.
+    # Se mantiene con cada Venta (ver core/reportes.py) para que el reporte no recorra las ventas.
+    fecha = models.DateField()
+    hora = models.PositiveSmallIntegerField()
+    metodo_pago = models.CharField(max_length=50)
+    num_ventas = models.PositiveIntegerField(default=0)
+    total = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['fecha', 'hora', 'metodo_pago'], name='resumen_ventas_unico'),
+        ]
+
+    def __str__(self):
+        return f"{self.fecha} {self.hora:02d}h {self.metodo_pago}: {self.total}"
+
+
+
+class ClaveIdempotencia(models.Model):
+    # Cada envío de la tablet lleva un Idempotency-Key: si la red corta y se reintenta,
+    # devolvemos la respuesta guardada en vez de crear otro Pedido + Venta.
+    clave = models.CharField(max_length=64, unique=True)
+    # sha256 del cuerpo enviado: la misma clave con otro pedido es un error del cliente
+    huella = models.CharField(max_length=64)
+    pedido = models.ForeignKey(Pedido, on_delete=models.SET_NULL, null=True, blank=True)
+    respuesta = models.JSONField()
+    creado_en = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    def __str__(self):
+        return self.clave
+
+
+# --- Archivo histórico (ver core/archivo.py) ---
+# Pedidos pagados hace más de FOODFLOW_ARCHIVO_DIAS salen de las tablas activas y se
+# guardan aquí con el mismo id. Los nombres de los campos y relaciones son los mismos
+# (pedido__venta__fecha_venta, producto__precio...) para que reportes y exportación
+# consulten ambas tablas con el mismo código. Sin claves foráneas hacia mesas,
+# usuarios o productos: el archivo no impide borrarlos.
+
+class PedidoArchivado(models.Model):
+    id = models.IntegerField(primary_key=True)
+    # null=True para que las consultas hagan LEFT JOIN: la mesa o el producto pueden borrarse después
+    mesa = models.ForeignKey(Mesa, on_delete=models.DO_NOTHING, db_constraint=False, null=True, related_name='+')
+    creado_en = models.DateTimeField()
+    actualizado_en = models.DateTimeField()
+    estado = models.CharField(max_length=20, choices=Pedido.ESTADOS_PEDIDO)
+    listo_en = models.DateTimeField(null=True, blank=True)
+    nota_general = models.TextField(blank=True, null=True)
+    es_urgente = models.BooleanField(default=False)
+    usuario = models.ForeignKey(
+        User, on_delete=models.DO_NOTHING, db_constraint=False, null=True, blank=True, related_name='+'
+    )
+    cliente_cedula = models.CharField(max_length=13, blank=True, null=True, verbose_name="Cédula Cliente")
+    metodo_pago = models.CharField(max_length=20, default='efectivo')
+    subtotal = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
+    iva = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
+    total = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
+    archivado_en = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name_plural = 'pedidos archivados'
+        indexes = [
+            models.Index(fields=['creado_en'], name='pedido_arch_creado_idx'),
+            models.Index(fields=['cliente_cedula'], name='pedido_arch_cedula_idx'),
+        ]
+
+    def __str__(self):
+        return f"Pedido #{self.id} (archivado)"
+
+
+class DetalleArchivado(models.Model):
+    id = models.IntegerField(primary_key=True)
+    pedido = models.ForeignKey(PedidoArchivado, on_delete=models.CASCADE, related_name='detalles')
+    producto = models.ForeignKey(
+        Producto, on_delete=models.DO_NOTHING, db_constraint=False, null=True, related_name='+'
+    )
+    cantidad = models.IntegerField(default=1)
+    precio_unitario = models.DecimalField(max_digits=6, decimal_places=2, null=True, blank=True)
+    nota = models.CharField(max_length=200, blank=True, null=True)
+
+
+class VentaArchivada(models.Model):
+    id = models.IntegerField(primary_key=True)
+    pedido = models.OneToOneField(PedidoArchivado, on_delete=models.CASCADE, related_name='venta')
+    fecha_venta = models.DateTimeField()
+    total = models.DecimalField(max_digits=10, decimal_places=2)
+    metodo_pago = models.CharField(max_length=50, default='efectivo')
+
+    class Meta:
+        verbose_name_plural = 'ventas archivadas'
+        indexes = [
+            models.Index(fields=['fecha_venta', 'metodo_pago'], name='venta_arch_fecha_metodo_idx'),
+        ]
+
+    def __str__(self):
+        return f"Venta #{self.id} - {self.total} (archivada)"
+
+
+# --- Cola de trabajos en segundo plano (ver core/trabajos.py) ---
+class Trabajo(models.Model):
+    ESTADOS = [
+        ('pendiente', 'Pendiente'),
+        ('en_curso', 'En curso'),
+        ('hecho', 'Hecho'),
+        ('fallido', 'Fallido'),
+    ]
+    # Nombre con el que se registró la función (@trabajos.tarea)
+    tarea = models.CharField(max_length=100)
+    argumentos = models.JSONField(default=dict, encoder=DjangoJSONEncoder)
+    # Menor número, antes se ejecuta
+    prioridad = models.SmallIntegerField(default=50)
+    # Misma clave = mismo trabajo: encolar dos veces no lo repite
+    clave = models.CharField(max_length=200, unique=True, null=True, blank=True)
+    estado = models.CharField(max_length=20, choices=ESTADOS, default='pendiente')
+    intentos = models.PositiveSmallIntegerField(default=0)
+    max_intentos = models.PositiveSmallIntegerField(default=5)
+    ejecutar_en = models.DateTimeField(default=timezone.now)
+    # Si el worker muere a mitad, pasado este momento otro lo vuelve a tomar
+    bloqueado_hasta = models.DateTimeField(null=True, blank=True)
+    error = models.TextField(blank=True)
+    creado_en = models.DateTimeField(auto_now_add=True)
+    terminado_en = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # El worker busca solo entre los pendientes, por prioridad y hora
+            models.Index(
+                fields=['prioridad', 'ejecutar_en'],
+                condition=models.Q(estado='pendiente'),
+                name='trabajo_pendientes_idx',
+            ),
+            models.Index(
+                fields=['bloqueado_hasta'],
+                condition=models.Q(estado='en_curso'),
+                name='trabajo_en_curso_idx',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.tarea} #{self.id} ({self.estado})"
+
+
+class Version(models.Model):
+    # Versión del menú, el mapa de mesas o los roles cuando la caché no es compartida
+    # entre workers (ver core/versiones.py)
+    nombre = models.CharField(max_length=30, primary_key=True)
+    numero = models.BigIntegerField()
+    modificado = models.DateTimeField()
+
+    def __str__(self):
+        return f"{self.nombre} {self.numero}"
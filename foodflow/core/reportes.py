@@ -0,0 +1,128 @@
+"""
+Reportes de caja sobre rangos semiabiertos [inicio, fin) en hora local.
+
+Filtrar con ``fecha_venta__date=...`` obliga a convertir cada fila a fecha local y
+no aprovecha el índice; aquí siempre se compara la columna contra dos datetimes.
+Los totales por día salen de ``ResumenVentas``, que se mantiene con cada Venta.
+Las ventas archivadas (ver core/archivo.py) se leen junto con las activas.
+"""
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+from itertools import chain
+from operator import attrgetter
+from zoneinfo import ZoneInfo
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncHour
+from django.utils import timezone
+
+from .models import ResumenVentas, Venta, VentaArchivada
+
+ZONA = ZoneInfo(settings.TIME_ZONE)
+
+
+def rango_dia(fecha):
+    """Devuelve (inicio, fin) del día local como datetimes con zona horaria."""
+    inicio = datetime.combine(fecha, time.min, tzinfo=ZONA)
+    return inicio, inicio + timedelta(days=1)
+
+
+def rango_fechas(desde, hasta):
+    """[desde 00:00, hasta+1 00:00) en hora local; ambas fechas incluidas."""
+    return rango_dia(desde)[0], rango_dia(hasta)[1]
+
+
+def ventas_del_dia(fecha, modelo=Venta):
+    inicio, fin = rango_dia(fecha)
+    return (
+        modelo.objects.filter(fecha_venta__gte=inicio, fecha_venta__lt=fin)
+        .select_related('pedido__usuario')
+        .order_by('fecha_venta')
+    )
+
+
+def todas_las_ventas_del_dia(fecha):
+    """Ventas activas y archivadas del día, en orden (una consulta indexada por tabla)."""
+    return sorted(
+        chain(ventas_del_dia(fecha), ventas_del_dia(fecha, VentaArchivada)), key=attrgetter('fecha_venta')
+    )
+
+
+def _bucket(momento):
+    local = timezone.localtime(momento, ZONA)
+    return local.date(), local.hour
+
+
+def sumar_a_resumen(momento, metodo_pago, num_ventas, total):
+    """
+    Suma (o resta, con valores negativos) una venta al bucket de su hora.
+    Usa UPDATE con F() para que dos cajas cobrando a la vez no se pisen.
+    """
+    fecha, hora = _bucket(momento)
+    filtro = {'fecha': fecha, 'hora': hora, 'metodo_pago': metodo_pago}
+    cambios = {'num_ventas': F('num_ventas') + num_ventas, 'total': F('total') + total}
+
+    if ResumenVentas.objects.filter(**filtro).update(**cambios):
+        return
+    try:
+        with transaction.atomic():
+            ResumenVentas.objects.create(**filtro, num_ventas=num_ventas, total=total)
+    except IntegrityError:
+        # Otro proceso creó el bucket justo antes
+        ResumenVentas.objects.filter(**filtro).update(**cambios)
+
+
+def resumen_dia(fecha):
+    """Totales del día leyendo como máximo 24 × métodos filas, sin tocar Venta."""
+    filas = ResumenVentas.objects.filter(fecha=fecha, num_ventas__gt=0)
+    total = Decimal('0')
+    num_ventas = 0
+    por_metodo = {}
+    por_hora = [Decimal('0')] * 24
+    for fila in filas:
+        total += fila.total
+        num_ventas += fila.num_ventas
+        por_metodo[fila.metodo_pago] = por_metodo.get(fila.metodo_pago, Decimal('0')) + fila.total
+        por_hora[fila.hora] += fila.total
+    return {'total': total, 'num_ventas': num_ventas, 'por_metodo': por_metodo, 'por_hora': por_hora}
+
+
+def reconstruir_resumenes(desde=None, hasta=None):
+    """Recalcula los resúmenes desde cero (para datos viejos o si algo se desincronizó)."""
+    filtro = {}
+    resumenes = ResumenVentas.objects.all()
+    if desde:
+        filtro['fecha_venta__gte'] = rango_dia(desde)[0]
+        resumenes = resumenes.filter(fecha__gte=desde)
+    if hasta:
+        filtro['fecha_venta__lt'] = rango_dia(hasta)[1]
+        resumenes = resumenes.filter(fecha__lte=hasta)
+
+    # Una misma hora puede tener ventas activas y archivadas: se suman
+    buckets = {}
+    for modelo in (Venta, VentaArchivada):
+        agrupadas = (
+            modelo.objects.filter(**filtro)
+            .annotate(hora_local=TruncHour('fecha_venta', tzinfo=ZONA))
+            .values('hora_local', 'metodo_pago')
+            .annotate(num_ventas=Count('id'), suma=Sum('total'))
+            .order_by()
+        )
+        for fila in agrupadas:
+            local = timezone.localtime(fila['hora_local'], ZONA)
+            clave = (local.date(), local.hour, fila['metodo_pago'])
+            acumulado = buckets.setdefault(clave, [0, Decimal('0')])
+            acumulado[0] += fila['num_ventas']
+            acumulado[1] += fila['suma']
+
+    nuevos = [
+        ResumenVentas(fecha=fecha, hora=hora, metodo_pago=metodo_pago, num_ventas=num_ventas, total=total)
+        for (fecha, hora, metodo_pago), (num_ventas, total) in buckets.items()
+    ]
+
+    with transaction.atomic():
+        resumenes.delete()
+        ResumenVentas.objects.bulk_create(nuevos, batch_size=500)
+    return len(nuevos)
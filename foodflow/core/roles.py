@@ -0,0 +1,56 @@
+"""
+Roles del personal (grupos Caja, Cocina y Mesero) resueltos una sola vez.
+
+Los grupos de cada usuario se guardan en el propio objeto ``request.user`` (una
+consulta por petición como máximo) y, si la caché es compartida entre workers, también
+en la caché. La caché se invalida al confirmar un cambio de membresía o de grupo; con
+la caché en memoria de cada proceso no se usa, porque la invalidación no llegaría a
+los otros workers y seguirían dando permisos quitados.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from . import versiones
+
+CAJA = 'Caja'
+COCINA = 'Cocina'
+MESERO = 'Mesero'
+
+DURACION_ROLES = 60 * 60 * 12
+
+
+def _clave(user_id):
+    # La versión global cambia cuando se renombra o borra un grupo
+    return f"foodflow:roles:{versiones.obtener('roles')['numero']}:{user_id}"
+
+
+def roles_de(user):
+    """Devuelve el frozenset con los nombres de grupo del usuario."""
+    if not user.is_authenticated:
+        return frozenset()
+
+    roles = getattr(user, '_foodflow_roles', None)
+    if roles is None:
+        if not settings.FOODFLOW_CACHE_COMPARTIDA:
+            roles = frozenset(user.groups.values_list('name', flat=True))
+        else:
+            clave = _clave(user.pk)
+            roles = cache.get(clave)
+            if roles is None:
+                roles = frozenset(user.groups.values_list('name', flat=True))
+                cache.set(clave, roles, DURACION_ROLES)
+        user._foodflow_roles = roles
+    return roles
+
+
+def tiene_rol(user, rol):
+    return user.is_superuser or rol in roles_de(user)
+
+
+def invalidar_usuario(user_id):
+    transaction.on_commit(lambda: cache.delete(_clave(user_id)))
+
+
+def invalidar_todos():
+    transaction.on_commit(lambda: versiones.incrementar('roles'))
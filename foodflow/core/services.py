@@ -0,0 +1,480 @@
+import hashlib
+import json
+from datetime import timedelta
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.db import IntegrityError, transaction
+from django.db.models import DecimalField, Exists, F, OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from . import analitica, eventos, tareas, versiones
+from .feeds import ESTADOS_COCINA
+from .models import Mesa, Producto, Pedido, DetallePedido, Venta, ClaveIdempotencia, Estacion, TicketEstacion
+
+# IVA vigente en Ecuador (el mismo que usa el JS del mesero)
+IVA = Decimal('0.15')
+CENTAVOS = Decimal('0.01')
+
+# Pedidos que acepta de una vez la sincronización de una tablet que estuvo sin red
+MAXIMO_LOTE = 50
+
+
+# Cambios de estado permitidos. Quedarse en el mismo estado siempre vale
+# (un doble toque no debe dar error).
+TRANSICIONES_MESA = {
+    'libre': {'ocupada', 'esperando'},
+    'ocupada': {'esperando', 'libre'},
+    'esperando': {'lista'},
+    'lista': {'esperando', 'pagar', 'libre'},
+    'pagar': {'esperando', 'libre'},
+}
+TRANSICIONES_PEDIDO = {
+    'pendiente': {'listo', 'problema'},
+    'problema': {'pendiente', 'listo'},
+    'listo': {'pagado'},
+    'pagado': set(),
+}
+
+
+class PedidoInvalido(ValueError):
+    """Los datos enviados por la tablet no permiten crear el pedido."""
+
+
+class ClaveReutilizada(ValueError):
+    """El Idempotency-Key ya se usó con un pedido distinto."""
+
+
+class TransicionInvalida(ValueError):
+    """El cambio de estado pedido no está permitido (o alguien se adelantó)."""
+
+
+def validar_transicion(transiciones, actual, nuevo, que='Estado'):
+    if nuevo != actual and nuevo not in transiciones.get(actual, ()):
+        raise TransicionInvalida(f'{que}: no se puede pasar de "{actual}" a "{nuevo}".')
+
+
+def redondear(valor):
+    return valor.quantize(CENTAVOS, rounding=ROUND_HALF_UP)
+
+
+def calcular_totales(subtotal):
+    # Devuelve (subtotal, iva, total) ya redondeados a centavos
+    subtotal = redondear(subtotal)
+    iva = redondear(subtotal * IVA)
+    return subtotal, iva, subtotal + iva
+
+
+def _normalizar_items(items):
+    # Agrupa cantidades por producto y valida lo que llega del carrito
+    if not items:
+        raise PedidoInvalido('El pedido está vacío.')
+
+    lineas = []
+    for item in items:
+        try:
+            producto_id = int(item['id'])
+            cantidad = int(item.get('cantidad', 1))
+        except (KeyError, TypeError, ValueError):
+            raise PedidoInvalido(f'Item inválido: {item!r}')
+        if cantidad < 1:
+            raise PedidoInvalido(f'Cantidad inválida para el producto {producto_id}.')
+        lineas.append((producto_id, cantidad, (item.get('nota') or '')[:200]))
+    return lineas
+
+
+def crear_pedido(mesa_id, items, usuario=None, nota='', urgente=False,
+                 metodo_pago='efectivo', cliente_cedula=''):
+    """
+    Registra un pedido completo (Pedido + detalles + Venta + estado de la Mesa)
+    en una sola transacción. Si algo falla no queda nada a medio guardar.
+
+    Devuelve el pedido creado con los totales calculados en el servidor.
+    """
+    lineas = _normalizar_items(items)
+
+    with transaction.atomic():
+        # Bloqueamos la mesa para no cruzarnos con un cobro en curso
+        mesa = Mesa.objects.select_for_update().filter(id=mesa_id).first()
+        if mesa is None:
+            raise PedidoInvalido(f'La mesa {mesa_id} no existe.')
+        validar_transicion(TRANSICIONES_MESA, mesa.estado, 'esperando', f'Mesa {mesa.numero}')
+
+        # Una sola consulta para todos los productos del carrito (con la estación de su categoría).
+        # Los desactivados en el menú no se pueden pedir aunque la tablet los tenga en caché.
+        productos = (
+            Producto.objects.filter(activo=True).select_related('categoria')
+            .in_bulk({producto_id for producto_id, _, _ in lineas})
+        )
+        faltantes = sorted({producto_id for producto_id, _, _ in lineas} - productos.keys())
+        if faltantes:
+            raise PedidoInvalido(f'Productos inexistentes o no disponibles: {faltantes}')
+
+        subtotal = sum(
+            (productos[producto_id].precio * cantidad for producto_id, cantidad, _ in lineas),
+            Decimal('0'),
+        )
+        subtotal, iva, total = calcular_totales(subtotal)
+
+        pedido = Pedido.objects.create(
+            mesa=mesa,
+            usuario=usuario,
+            nota_general=nota or None,
+            es_urgente=bool(urgente),
+            metodo_pago=metodo_pago,
+            cliente_cedula=cliente_cedula or None,
+            subtotal=subtotal,
+            iva=iva,
+            total=total,
+        )
+        tickets = _crear_tickets(pedido, [productos[producto_id] for producto_id, _, _ in lineas])
+        DetallePedido.objects.bulk_create([
+            DetallePedido(
+                pedido=pedido,
+                producto=productos[producto_id],
+                ticket=tickets.get(_estacion_de(productos[producto_id], tickets)),
+                cantidad=cantidad,
+                precio_unitario=productos[producto_id].precio,
+                nota=nota_item or None,
+            )
+            for producto_id, cantidad, nota_item in lineas
+        ])
+        Venta.objects.create(pedido=pedido, total=total, metodo_pago=metodo_pago)
+
+        Mesa.objects.filter(pk=mesa.pk).update(estado='esperando')
+
+        # Se envían al confirmar la transacción
+        eventos.publicar_pedido(pedido)
+        _mesa_cambiada(mesa.pk, 'esperando')
+
+    return pedido
+
+
+def _mesa_cambiada(mesa_id, estado):
+    # Al confirmar: versión nueva del mapa de mesas (tablets que consultan) y evento en vivo (SSE)
+    versiones.incrementar_al_confirmar('mesas')
+    eventos.publicar_mesa(mesa_id, estado)
+
+
+def _estacion_de(producto, tickets):
+    # Categorías sin estación van a la estación por defecto (clave None)
+    estacion_id = producto.categoria.estacion_id
+    return estacion_id if estacion_id in tickets else None
+
+
+def _crear_tickets(pedido, productos):
+    """
+    Reparte el pedido entre estaciones: un TicketEstacion por cada estación que
+    tiene algo que preparar. Devuelve {estacion_id: ticket}, con la clave None
+    apuntando al ticket de la estación por defecto. Sin estaciones no crea nada.
+    """
+    estaciones = {producto.categoria.estacion_id for producto in productos}
+    por_defecto = None
+    if None in estaciones:
+        estaciones.discard(None)
+        por_defecto = Estacion.objects.values_list('id', flat=True).first()
+        if por_defecto is None:
+            return {}
+        estaciones.add(por_defecto)
+
+    creados = TicketEstacion.objects.bulk_create([
+        TicketEstacion(pedido=pedido, estacion_id=estacion_id) for estacion_id in sorted(estaciones)
+    ])
+    tickets = {ticket.estacion_id: ticket for ticket in creados}
+    tickets[None] = tickets.get(por_defecto)
+    return tickets
+
+
+def _bloquear_pedido(pedido_id):
+    # Orden de bloqueo fijo (mesa y luego pedidos) para no provocar deadlocks con cobrar_mesa
+    mesa_id = Pedido.objects.values_list('mesa_id', flat=True).get(pk=pedido_id)
+    Mesa.objects.select_for_update().filter(pk=mesa_id).exists()
+    return Pedido.objects.select_for_update().get(pk=pedido_id)
+
+
+def _cambiar_estado_pedido(pedido, nuevo):
+    """Compare-and-set: solo cambia si nadie tocó el estado desde que lo leímos."""
+    validar_transicion(TRANSICIONES_PEDIDO, pedido.estado, nuevo, f'Pedido #{pedido.pk}')
+    if pedido.estado == nuevo:
+        return False
+    ahora = timezone.now()
+    cambios = {'estado': nuevo, 'actualizado_en': ahora}
+    if nuevo == 'listo':
+        cambios['listo_en'] = ahora
+    if not Pedido.objects.filter(pk=pedido.pk, estado=pedido.estado).update(**cambios):
+        raise TransicionInvalida(f'El pedido #{pedido.pk} cambió mientras se procesaba.')
+    for campo, valor in cambios.items():
+        setattr(pedido, campo, valor)
+    if nuevo == 'listo' and timezone.localdate(pedido.creado_en) < timezone.localdate(ahora):
+        # Pedido de ayer que sale pasada la medianoche: su día ya estaba cerrado en la analítica
+        analitica.invalidar_dia(pedido.creado_en)
+    return True
+
+
+def _pedido_listo(pedido):
+    if not _cambiar_estado_pedido(pedido, 'listo'):
+        return
+    # Si lo cerró el monitor general, las estaciones también lo dan por terminado
+    TicketEstacion.objects.filter(pedido=pedido, estado='pendiente').update(
+        estado='listo', listo_en=pedido.listo_en, actualizado_en=pedido.listo_en
+    )
+    pendientes = Pedido.objects.filter(mesa_id=pedido.mesa_id, estado__in=ESTADOS_COCINA).exists()
+    if not pendientes and Mesa.objects.filter(pk=pedido.mesa_id, estado='esperando').update(estado='lista'):
+        _mesa_cambiada(pedido.mesa_id, 'lista')
+    eventos.publicar_pedido(pedido)
+
+
+def marcar_listo(pedido_id):
+    """
+    La cocina terminó el pedido. La mesa pasa a 'lista' solo cuando ya no le
+    quedan otros pedidos en cocina. Lanza Pedido.DoesNotExist si no existe.
+    """
+    with transaction.atomic():
+        pedido = _bloquear_pedido(pedido_id)
+        _pedido_listo(pedido)
+    return pedido
+
+
+def marcar_ticket_listo(ticket_id):
+    """
+    Una estación terminó su parte. El pedido pasa a 'listo' cuando ya no le
+    queda ningún ticket pendiente. Lanza TicketEstacion.DoesNotExist si no existe.
+    """
+    with transaction.atomic():
+        ticket = TicketEstacion.objects.get(pk=ticket_id)
+        pedido = _bloquear_pedido(ticket.pedido_id)
+        if pedido.estado not in ESTADOS_COCINA and pedido.estado != 'listo':
+            raise TransicionInvalida(f'El pedido #{pedido.pk} ya está {pedido.estado}.')
+
+        ahora = timezone.now()
+        if not TicketEstacion.objects.filter(pk=ticket.pk, estado='pendiente').update(
+            estado='listo', listo_en=ahora, actualizado_en=ahora
+        ):
+            return ticket  # doble toque: ya estaba listo
+        ticket.estado, ticket.listo_en, ticket.actualizado_en = 'listo', ahora, ahora
+
+        if not TicketEstacion.objects.filter(pedido=pedido, estado='pendiente').exists():
+            _pedido_listo(pedido)
+        else:
+            eventos.publicar_pedido(pedido)
+    return ticket
+
+
+def reportar_problema(pedido_id):
+    with transaction.atomic():
+        pedido = _bloquear_pedido(pedido_id)
+        if _cambiar_estado_pedido(pedido, 'problema'):
+            # Para que las pantallas de estación también lo vean en su feed
+            TicketEstacion.objects.filter(pedido=pedido, estado='pendiente').update(actualizado_en=pedido.actualizado_en)
+            eventos.publicar_pedido(pedido)
+    return pedido
+
+
+def cobrar_mesa(mesa_id):
+    """
+    Cobra todos los pedidos abiertos de la mesa y la deja libre, en una sola transacción.
+
+    La mesa y sus pedidos se bloquean con SELECT ... FOR UPDATE, así dos cajas (o
+    un doble toque) no pueden cobrar dos veces. En SQLite, que no tiene FOR UPDATE,
+    los UPDATE condicionales hacen de compare-and-set y el perdedor se revierte.
+    No depende de cuántos pedidos tenga la mesa: son siempre las mismas consultas.
+
+    Devuelve la lista de pedidos cobrados. Lanza Mesa.DoesNotExist o TransicionInvalida.
+    """
+    with transaction.atomic():
+        mesa = Mesa.objects.select_for_update().get(pk=mesa_id)
+        pedidos = list(
+            Pedido.objects.select_for_update()
+            .filter(mesa=mesa)
+            .exclude(estado='pagado')
+            .annotate(tiene_venta=Exists(Venta.objects.filter(pedido=OuterRef('pk'))))
+            .order_by('id')
+        )
+        if not pedidos:
+            raise TransicionInvalida(f'La mesa {mesa.numero} no tiene pedidos por cobrar.')
+        en_cocina = [p.pk for p in pedidos if p.estado != 'listo']
+        if en_cocina:
+            raise TransicionInvalida(f'La mesa {mesa.numero} todavía tiene pedidos en cocina: {en_cocina}')
+        validar_transicion(TRANSICIONES_MESA, mesa.estado, 'libre', f'Mesa {mesa.numero}')
+
+        ahora = timezone.now()
+        ids = [p.pk for p in pedidos]
+        cobrados = Pedido.objects.filter(pk__in=ids, estado='listo').update(estado='pagado', actualizado_en=ahora)
+        liberada = Mesa.objects.filter(pk=mesa.pk, estado=mesa.estado).update(estado='libre')
+        if cobrados != len(ids) or not liberada:
+            raise TransicionInvalida(f'La mesa {mesa.numero} cambió mientras se cobraba.')
+
+        # Pedidos del flujo antiguo que todavía no tienen su Venta. Si además no tienen
+        # total guardado (creados fuera de crear_pedido), se calcula de sus detalles
+        sin_total = [p for p in pedidos if not p.tiene_venta and not p.total]
+        if sin_total:
+            completar_totales(sin_total)
+        nuevas = [
+            Venta(pedido=p, total=p.total, metodo_pago=p.metodo_pago, fecha_venta=ahora)
+            for p in pedidos if not p.tiene_venta
+        ]
+        if nuevas:
+            Venta.objects.bulk_create(nuevas)
+            # bulk_create no dispara señales: encolamos el resumen por método de pago
+            for metodo in {v.metodo_pago for v in nuevas}:
+                del_metodo = [v for v in nuevas if v.metodo_pago == metodo]
+                tareas.sumar_venta.encolar(
+                    momento=ahora, metodo_pago=metodo, num_ventas=len(del_metodo),
+                    total=sum(v.total for v in del_metodo),
+                )
+
+        for pedido in pedidos:
+            pedido.estado, pedido.actualizado_en = 'pagado', ahora
+            eventos.publicar_pedido(pedido)
+        _mesa_cambiada(mesa.pk, 'libre')
+    return pedidos
+
+
+def respuesta_pedido(pedido):
+    # Lo que recibe la tablet al confirmar (los totales oficiales los calcula el servidor)
+    return {
+        'status': 'ok',
+        'id_pedido': pedido.id,
+        'subtotal': str(pedido.subtotal),
+        'iva': str(pedido.iva),
+        'total': str(pedido.total),
+    }
+
+
+def _huella(datos):
+    return hashlib.sha256(json.dumps(datos, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def _respuesta_guardada(clave, huella):
+    registro = ClaveIdempotencia.objects.filter(clave=clave).first()
+    if registro is None:
+        return None
+    if registro.huella != huella:
+        raise ClaveReutilizada(f'La clave {clave} ya se usó con otro pedido.')
+    return registro.respuesta
+
+
+def registrar_pedido(datos, usuario=None, clave=None):
+    """
+    Crea el pedido a partir del JSON de la tablet.
+
+    Con ``clave`` (el Idempotency-Key) un reintento devuelve la respuesta del primer
+    envío sin volver a insertar nada. Devuelve (respuesta, repetida).
+    """
+    if not isinstance(datos, dict):
+        raise PedidoInvalido('El pedido debe ser un objeto JSON.')
+    if clave and len(clave) > 64:
+        raise PedidoInvalido('La clave de idempotencia admite máximo 64 caracteres.')
+    huella = _huella(datos)
+    if clave:
+        previa = _respuesta_guardada(clave, huella)
+        if previa is not None:
+            return previa, True
+
+    try:
+        with transaction.atomic():
+            pedido = crear_pedido(
+                mesa_id=datos.get('mesa_id'),
+                items=datos.get('items'),
+                usuario=usuario,
+                nota=datos.get('notas', ''),
+                urgente=datos.get('urgente', False),
+                metodo_pago=datos.get('metodo_pago', 'efectivo'),
+                cliente_cedula=datos.get('cliente_cedula', ''),
+            )
+            respuesta = respuesta_pedido(pedido)
+            if clave:
+                ClaveIdempotencia.objects.create(clave=clave, huella=huella, pedido=pedido, respuesta=respuesta)
+    except IntegrityError:
+        # Dos reintentos a la vez: el otro guardó la clave primero y este se revirtió entero
+        previa = _respuesta_guardada(clave, huella) if clave else None
+        if previa is None:
+            raise
+        return previa, True
+    return respuesta, False
+
+
+def sincronizar_pedidos(lote, usuario=None):
+    """
+    Ingresa en una sola transacción los pedidos que la tablet guardó sin conexión.
+
+    Cada pedido trae su ``clave``: si el lote se reenvía porque se perdió la respuesta,
+    los ya registrados se devuelven tal cual. Un pedido inválido no tumba el resto
+    (va en su propio savepoint) y vuelve con status 'error'.
+    """
+    if not isinstance(lote, list) or not lote:
+        raise PedidoInvalido('No hay pedidos para sincronizar.')
+    if len(lote) > MAXIMO_LOTE:
+        raise PedidoInvalido(f'Máximo {MAXIMO_LOTE} pedidos por sincronización.')
+
+    resultados = []
+    with transaction.atomic():
+        for datos in lote:
+            if not isinstance(datos, dict):
+                raise PedidoInvalido(f'Pedido inválido: {datos!r}')
+            datos = dict(datos)
+            clave = datos.pop('clave', None) or None
+            try:
+                respuesta, _ = registrar_pedido(datos, usuario=usuario, clave=clave)
+            except ValueError as e:
+                respuesta = {'status': 'error', 'message': str(e)}
+            resultados.append({'clave': clave, **respuesta})
+    return resultados
+
+
+def purgar_claves(dias=7):
+    # Pasado el tiempo en que una tablet podría reintentar, las claves ya no sirven
+    limite = timezone.now() - timedelta(days=dias)
+    return ClaveIdempotencia.objects.filter(creado_en__lt=limite).delete()[0]
+
+
+def completar_precios(detalles):
+    # Detalles sin precio guardado (históricos o creados desde el admin): toman el precio actual
+    return detalles.filter(precio_unitario__isnull=True).update(
+        precio_unitario=Subquery(Producto.objects.filter(pk=OuterRef('producto_id')).values('precio')[:1])
+    )
+
+
+def totales_calculados(pedidos):
+    """Anota en cada pedido el subtotal que resulta de sus detalles (una sola consulta)."""
+    return pedidos.annotate(
+        subtotal_calculado=Coalesce(
+            Sum(F('detalles__cantidad') * F('detalles__precio_unitario'),
+                output_field=DecimalField(max_digits=12, decimal_places=2)),
+            Decimal('0'),
+            output_field=DecimalField(max_digits=12, decimal_places=2),
+        )
+    )
+
+
+def completar_totales(pedidos):
+    """Calcula y guarda los totales de varios pedidos a la vez (2-3 consultas)."""
+    completar_precios(DetallePedido.objects.filter(pedido__in=pedidos))
+    calculados = dict(
+        totales_calculados(Pedido.objects.filter(pk__in=[p.pk for p in pedidos])).values_list('pk', 'subtotal_calculado')
+    )
+    for pedido in pedidos:
+        pedido.subtotal, pedido.iva, pedido.total = calcular_totales(calculados[pedido.pk])
+    Pedido.objects.bulk_update(pedidos, ['subtotal', 'iva', 'total'])
+    return pedidos
+
+
+def recalcular_totales(pedido):
+    """
+    Único punto que recalcula subtotal/IVA/total de un pedido a partir del
+    precio guardado en cada detalle. Úsalo después de editar los detalles.
+    Si ya tiene Venta, su total se corrige en la misma transacción (con save(): la
+    señal encola el ajuste del resumen de ventas).
+    """
+    with transaction.atomic():
+        completar_precios(pedido.detalles.all())
+        calculado = totales_calculados(Pedido.objects.filter(pk=pedido.pk)).get()
+        pedido.subtotal, pedido.iva, pedido.total = calcular_totales(calculado.subtotal_calculado)
+        Pedido.objects.filter(pk=pedido.pk).update(
+            subtotal=pedido.subtotal, iva=pedido.iva, total=pedido.total, actualizado_en=timezone.now()
+        )
+        venta = Venta.objects.filter(pedido_id=pedido.pk).first()
+        if venta is not None and venta.total != pedido.total:
+            venta.total = pedido.total
+            venta.save(update_fields=['total'])
+    return pedido
@@ -0,0 +1,111 @@
+from django.contrib.auth.models import Group, User
+from django.contrib.auth.signals import user_logged_out
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_save, post_delete, pre_save
+from django.dispatch import receiver
+
+from . import analitica, autenticacion, imagenes, roles, tareas, versiones
+from .catalogo import invalidar_catalogo
+from .models import Categoria, DetallePedido, Mesa, Pedido, Producto, Venta
+
+
+# Cualquier cambio en el menú genera una versión nueva del catálogo. Al confirmar:
+# antes, otra petición podría armar el menú viejo y guardarlo con la versión nueva
+@receiver([post_save, post_delete], sender=Producto)
+@receiver([post_save, post_delete], sender=Categoria)
+def catalogo_modificado(sender, **kwargs):
+    transaction.on_commit(invalidar_catalogo)
+
+
+# Mesas o pedidos editados desde el admin: el mapa de las tablets tiene que enterarse
+# (los cambios de services usan update() y suben la versión por su cuenta; si en la misma
+# transacción se crea un Pedido, la versión sube una sola vez)
+@receiver([post_save, post_delete], sender=Mesa)
+@receiver([post_save, post_delete], sender=Pedido)
+def mapa_mesas_modificado(sender, **kwargs):
+    versiones.incrementar_al_confirmar('mesas')
+
+
+# Foto nueva o cambiada: las miniaturas se generan en el worker (core/tareas.py)
+@receiver(post_save, sender=Producto)
+def producto_guardado(sender, instance, raw=False, **kwargs):
+    if raw or not imagenes.necesita_variantes(instance):
+        return
+    if instance.imagen:
+        # El nombre del archivo cambia con cada foto subida: una sola vez por foto
+        tareas.generar_miniaturas.encolar(producto_id=instance.pk, clave=f'miniaturas:{instance.pk}:{instance.imagen.name}')
+    else:
+        # Se quitó la foto: solo hay que vaciar las variantes
+        imagenes.actualizar_producto(instance)
+
+
+# Cambios de grupos: los roles cacheados de esos usuarios dejan de valer
+@receiver(m2m_changed, sender=User.groups.through)
+def grupos_modificados(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        roles.invalidar_usuario(instance.pk)
+    elif pk_set:
+        for user_id in pk_set:
+            roles.invalidar_usuario(user_id)
+    else:
+        # group.user_set.clear(): no sabemos qué usuarios eran
+        roles.invalidar_todos()
+
+
+@receiver([post_save, post_delete], sender=Group)
+def grupo_modificado(sender, **kwargs):
+    roles.invalidar_todos()
+
+
+# Usuario cacheado de la sesión: cambio de contraseña, is_active, borrado o logout
+@receiver([post_save, post_delete], sender=User)
+def usuario_modificado(sender, instance, **kwargs):
+    autenticacion.invalidar_usuario(instance.pk)
+
+
+@receiver(user_logged_out)
+def usuario_salio(sender, user, **kwargs):
+    if user is not None:
+        autenticacion.invalidar_usuario(user.pk)
+
+
+# --- Resumen de ventas por hora: se ajusta con cada Venta (en el worker, tareas.sumar_venta) ---
+@receiver(pre_save, sender=Venta)
+def venta_antes_de_guardar(sender, instance, **kwargs):
+    # En una edición recordamos el bucket anterior para descontarlo
+    instance._resumen_anterior = None
+    if instance.pk:
+        instance._resumen_anterior = (
+            Venta.objects.filter(pk=instance.pk).values_list('fecha_venta', 'metodo_pago', 'total').first()
+        )
+
+
+@receiver(post_save, sender=Venta)
+def venta_guardada(sender, instance, created, **kwargs):
+    anterior = getattr(instance, '_resumen_anterior', None)
+    if anterior:
+        fecha_venta, metodo_pago, total = anterior
+        tareas.sumar_venta.encolar(momento=fecha_venta, metodo_pago=metodo_pago, num_ventas=-1, total=-total)
+        analitica.invalidar_dia(fecha_venta)
+    tareas.sumar_venta.encolar(
+        momento=instance.fecha_venta, metodo_pago=instance.metodo_pago, num_ventas=1, total=instance.total,
+    )
+    analitica.invalidar_dia(instance.fecha_venta)
+
+
+@receiver(post_delete, sender=Venta)
+def venta_eliminada(sender, instance, **kwargs):
+    tareas.sumar_venta.encolar(
+        momento=instance.fecha_venta, metodo_pago=instance.metodo_pago, num_ventas=-1, total=-instance.total,
+    )
+    analitica.invalidar_dia(instance.fecha_venta)
+
+
+# Detalles editados desde el admin: el día de su venta se recalcula en la analítica
+@receiver([post_save, post_delete], sender=DetallePedido)
+def detalle_modificado(sender, instance, **kwargs):
+    fecha_venta = Venta.objects.filter(pedido_id=instance.pedido_id).values_list('fecha_venta', flat=True).first()
+    if fecha_venta:
+        analitica.invalidar_dia(fecha_venta)
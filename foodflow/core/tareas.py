@@ -0,0 +1,53 @@
+"""
+Trabajos que salen de la petición y corren en ``manage.py procesar_trabajos``
+(cola en core/trabajos.py).
+
+- ``sumar_venta``: el resumen por hora (ResumenVentas). Antes cada pedido y cada
+  cobro actualizaba la misma fila de la hora dentro de su transacción, y todas las
+  tablets hacían cola en ese bloqueo; ahora el pedido solo inserta el trabajo.
+- ``generar_miniaturas``: Pillow sobre la foto subida (segundos con fotos grandes).
+- ``archivar_pedidos``: el archivo de cada noche; al terminar se programa para la
+  noche siguiente.
+"""
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import analitica, archivo, imagenes, reportes
+from .models import Producto
+from .trabajos import BAJA, encolar, tarea
+
+HORA_ARCHIVO = 3
+
+
+@tarea()
+def sumar_venta(momento, metodo_pago, num_ventas, total):
+    # Los argumentos vienen de JSON: fecha y total llegan como texto
+    momento = parse_datetime(momento)
+    reportes.sumar_a_resumen(momento, metodo_pago, num_ventas, Decimal(total))
+    analitica.invalidar_dia(momento)
+
+
+@tarea(prioridad=BAJA, duracion=600, atomica=False)
+def generar_miniaturas(producto_id):
+    producto = Producto.objects.filter(pk=producto_id).first()
+    if producto is not None:
+        imagenes.actualizar_producto(producto)
+
+
+@tarea(prioridad=BAJA, max_intentos=3, duracion=60 * 60, atomica=False)
+def archivar_pedidos():
+    # Cada lote va en su transacción (ver core/archivo.py): no se envuelve en una sola
+    archivo.archivar()
+    programar_archivo()
+
+
+def programar_archivo():
+    """Encola el archivo de la próxima madrugada (si ya está encolado, no hace nada)."""
+    ahora = timezone.localtime()
+    siguiente = datetime.combine(ahora.date(), time(HORA_ARCHIVO), tzinfo=ahora.tzinfo)
+    if siguiente <= ahora:
+        siguiente += timedelta(days=1)
+    return encolar('archivar_pedidos', clave=f'archivo:{siguiente.date().isoformat()}', ejecutar_en=siguiente)
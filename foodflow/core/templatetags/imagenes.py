@@ -0,0 +1,17 @@
+from django import template
+
+register = template.Library()
+
+
+@register.inclusion_tag('comun/imagen_producto.html')
+def imagen_producto(prod, clase='', estilo=''):
+    """
+    <picture> con WebP + JPEG en srcset y carga diferida para un producto del catálogo.
+    Si aún no tiene miniaturas, usa la imagen original.
+    """
+    return {
+        'prod': prod,
+        'mini': prod.get('miniatura') or {},
+        'clase': clase,
+        'estilo': estilo,
+    }
@@ -0,0 +1,214 @@
+"""
+Cola de trabajos en la base de datos (sin Redis ni broker).
+
+La vista guarda lo esencial (pedido, cobro) y deja lo secundario encolado: el
+resumen de ventas, las miniaturas, el archivo nocturno (ver core/tareas.py). El
+trabajo se inserta en la misma transacción que el pedido: si el pedido se revierte,
+el trabajo tampoco existe.
+
+Los ejecuta ``manage.py procesar_trabajos`` (un proceso aparte, uno o varios):
+
+- Prioridad: menor número primero (``ALTA``, ``NORMAL``, ``BAJA``).
+- Reintentos con espera exponencial (10 s, 20 s, 40 s... hasta una hora) y un poco de
+  azar para que los fallos no se reintenten todos juntos. Agotados, queda ``fallido``
+  (se puede reintentar desde el admin).
+- ``clave``: encolar dos veces la misma clave devuelve el trabajo existente. Si queda
+  ``fallido`` la clave se libera, así se puede volver a encolar (por ejemplo las
+  miniaturas después de corregir la foto).
+- Las tareas ``atomica=True`` corren en una transacción junto con el "hecho": si el
+  worker muere a mitad no queda nada aplicado y se reintenta entera.
+- Dos workers no toman el mismo trabajo (UPDATE condicional, como en services).
+  Si un worker muere, pasado ``duracion`` el trabajo vuelve a pendiente.
+
+En desarrollo (``FOODFLOW_TRABAJOS_EN_LINEA``, activo con DEBUG) los trabajos listos
+corren en el mismo proceso al confirmar la transacción; los programados para después
+(el archivo nocturno) y los reintentos quedan en la cola hasta correr
+``manage.py procesar_trabajos --una-vez``.
+"""
+import logging
+import random
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Trabajo
+
+logger = logging.getLogger(__name__)
+
+ALTA = 0
+NORMAL = 50
+BAJA = 100
+
+ESPERA_BASE = 10
+ESPERA_MAXIMA = 60 * 60
+
+TAREAS = {}
+
+
+class TrabajoTomado(Exception):
+    """Otro worker se quedó con el trabajo (venció el bloqueo): se revierte lo hecho."""
+
+
+class Tarea:
+    def __init__(self, funcion, nombre, prioridad, max_intentos, duracion, atomica):
+        self.funcion = funcion
+        self.nombre = nombre
+        self.prioridad = prioridad
+        self.max_intentos = max_intentos
+        self.duracion = duracion
+        self.atomica = atomica
+
+    def __call__(self, *args, **kwargs):
+        return self.funcion(*args, **kwargs)
+
+    def encolar(self, **argumentos):
+        return encolar(self.nombre, **argumentos)
+
+
+def tarea(nombre=None, prioridad=NORMAL, max_intentos=5, duracion=300, atomica=True):
+    """
+    Registra una función como tarea. Sus argumentos tienen que ser serializables a
+    JSON (fechas y Decimal llegan como texto). ``duracion``: segundos que el worker
+    se reserva el trabajo antes de darlo por perdido.
+    """
+    def registrar(funcion):
+        registrada = Tarea(funcion, nombre or funcion.__name__, prioridad, max_intentos, duracion, atomica)
+        TAREAS[registrada.nombre] = registrada
+        return registrada
+    return registrar
+
+
+def encolar(nombre, *, clave=None, prioridad=None, ejecutar_en=None, **argumentos):
+    """Crea el trabajo (o devuelve el que ya tiene esa ``clave``)."""
+    registrada = TAREAS[nombre]
+    datos = {
+        'tarea': nombre,
+        'argumentos': argumentos,
+        'prioridad': registrada.prioridad if prioridad is None else prioridad,
+        'max_intentos': registrada.max_intentos,
+        'ejecutar_en': ejecutar_en or timezone.now(),
+    }
+    if clave is None:
+        trabajo = Trabajo.objects.create(**datos)
+    else:
+        existente = Trabajo.objects.filter(clave=clave).first()
+        if existente is not None:
+            return existente
+        try:
+            with transaction.atomic():
+                trabajo = Trabajo.objects.create(clave=clave, **datos)
+        except IntegrityError:
+            # Otro proceso lo encoló justo antes
+            return Trabajo.objects.get(clave=clave)
+
+    # Los programados para más tarde esperan al worker (o al cron)
+    if settings.FOODFLOW_TRABAJOS_EN_LINEA and trabajo.ejecutar_en <= timezone.now():
+        transaction.on_commit(lambda: ejecutar(trabajo.pk))
+    return trabajo
+
+
+def espera(intentos):
+    """Segundos hasta el próximo intento (exponencial, con ±20 % de azar)."""
+    segundos = min(ESPERA_MAXIMA, ESPERA_BASE * 2 ** max(0, intentos - 1))
+    return segundos * random.uniform(0.8, 1.2)
+
+
+def recuperar_vencidos():
+    """Trabajos de un worker que murió a mitad: vuelven a la cola."""
+    return Trabajo.objects.filter(estado='en_curso', bloqueado_hasta__lt=timezone.now()).update(estado='pendiente')
+
+
+def _reservar(pk, nombre, estado='pendiente'):
+    registrada = TAREAS.get(nombre)
+    duracion = registrada.duracion if registrada else 60
+    return Trabajo.objects.filter(pk=pk, estado=estado).update(
+        estado='en_curso',
+        intentos=F('intentos') + 1,
+        bloqueado_hasta=timezone.now() + timedelta(seconds=duracion),
+    )
+
+
+def tomar():
+    """Reserva el próximo trabajo listo para correr (o None si no hay)."""
+    candidatos = (
+        Trabajo.objects.filter(estado='pendiente', ejecutar_en__lte=timezone.now())
+        .order_by('prioridad', 'ejecutar_en', 'id')
+        .values_list('id', 'tarea')[:10]
+    )
+    for pk, nombre in candidatos:
+        # Compare-and-set: si otro worker lo tomó primero, probamos con el siguiente
+        if _reservar(pk, nombre):
+            return Trabajo.objects.get(pk=pk)
+    return None
+
+
+def _terminar(trabajo, **cambios):
+    return Trabajo.objects.filter(pk=trabajo.pk, estado='en_curso', intentos=trabajo.intentos).update(**cambios)
+
+
+def ejecutar(trabajo):
+    """Corre un trabajo ya reservado (o un id, para ``FOODFLOW_TRABAJOS_EN_LINEA``). Devuelve True si salió bien."""
+    if not isinstance(trabajo, Trabajo):
+        if not _reservar(trabajo, Trabajo.objects.filter(pk=trabajo).values_list('tarea', flat=True).first()):
+            return False
+        trabajo = Trabajo.objects.get(pk=trabajo)
+
+    registrada = TAREAS.get(trabajo.tarea)
+    if registrada is None:
+        _terminar(
+            trabajo, estado='fallido', clave=None, error=f'Tarea desconocida: {trabajo.tarea}', terminado_en=timezone.now(),
+        )
+        logger.error('Trabajo %s: tarea desconocida %s', trabajo.pk, trabajo.tarea)
+        return False
+
+    try:
+        if registrada.atomica:
+            with transaction.atomic():
+                registrada(**trabajo.argumentos)
+                if not _terminar(trabajo, estado='hecho', error='', terminado_en=timezone.now()):
+                    raise TrabajoTomado(trabajo.pk)
+        else:
+            registrada(**trabajo.argumentos)
+            _terminar(trabajo, estado='hecho', error='', terminado_en=timezone.now())
+    except TrabajoTomado:
+        logger.warning('Trabajo %s: lo tomó otro worker, se descarta esta ejecución', trabajo.pk)
+        return False
+    except Exception:
+        error = traceback.format_exc()
+        if trabajo.intentos >= trabajo.max_intentos:
+            _terminar(trabajo, estado='fallido', clave=None, error=error, terminado_en=timezone.now())
+            logger.exception('Trabajo %s (%s) falló %d veces, queda fallido', trabajo.pk, trabajo.tarea, trabajo.intentos)
+        else:
+            segundos = espera(trabajo.intentos)
+            _terminar(
+                trabajo, estado='pendiente', error=error, bloqueado_hasta=None,
+                ejecutar_en=timezone.now() + timedelta(seconds=segundos),
+            )
+            logger.warning('Trabajo %s (%s) falló (intento %d), reintento en %.0f s',
+                           trabajo.pk, trabajo.tarea, trabajo.intentos, segundos)
+        return False
+    return True
+
+
+def procesar(maximo=None):
+    """Ejecuta los trabajos listos hasta vaciar la cola (o hasta ``maximo``). Devuelve cuántos corrió."""
+    recuperar_vencidos()
+    corridos = 0
+    while maximo is None or corridos < maximo:
+        trabajo = tomar()
+        if trabajo is None:
+            break
+        ejecutar(trabajo)
+        corridos += 1
+    return corridos
+
+
+def purgar(dias=7):
+    """Borra los trabajos hechos hace más de ``dias`` (los fallidos se quedan para revisarlos)."""
+    limite = timezone.now() - timedelta(days=dias)
+    borrados, _ = Trabajo.objects.filter(estado='hecho', terminado_en__lt=limite).delete()
+    return borrados
@@ -1,8 +1,29 @@
 from django.urls import path
 # Importación obligatoria para que funcione el logout
 from django.contrib.auth.views import LogoutView 
+from django.conf import settings
 from .views import *
-from . import views
+from . import eventos, imagenes, views
+
+# Con uvicorn (FOODFLOW_ASGI=1) la API de las tablets corre en el event loop;
+# con gunicorn sync se usan las vistas de siempre
+if settings.FOODFLOW_ASGI:
+    api = {
+        'crear_pedido': views.crear_pedido_async,
+        'marcar_listo': views.marcar_listo_async,
+        'ticket_listo': views.ticket_listo_async,
+        'reportar_problema': views.reportar_problema_async,
+        'mapa_mesas': views.mapa_mesas_async,
+    }
+else:
+    api = {
+        'crear_pedido': CrearPedidoView.as_view(),
+        'marcar_listo': ActualizarEstadoPedido.as_view(),
+        'ticket_listo': TicketListoView.as_view(),
+        'reportar_problema': views.reportar_problema,
+        'mapa_mesas': views.mapa_mesas,
+    }
+
 urlpatterns = [
     # Rutas de Acceso
     path('', CustomLoginView.as_view(), name='index'),
@@ -13,10 +34,29 @@ urlpatterns = [
     # ------------------------------
     
     path('mesero/', MeseroView.as_view(), name='mesero'),
+    path('api/menu/', MenuApiView.as_view(), name='menu'),
     path('cocina/', CocinaView.as_view(), name='cocina'),
-    path('api/crear_pedido/', CrearPedidoView.as_view(), name='crear_pedido'),
-    path('api/pedido/<int:pk>/listo/', ActualizarEstadoPedido.as_view(), name='marcar_listo'),
+    path('api/cocina/feed/', CocinaFeedView.as_view(), name='cocina_feed'),
+    path('cocina/<slug:estacion>/', CocinaView.as_view(), name='cocina_estacion'),
+    path('api/cocina/<slug:estacion>/feed/', CocinaFeedView.as_view(), name='cocina_estacion_feed'),
+    path('api/crear_pedido/', api['crear_pedido'], name='crear_pedido'),
+    path('api/mesas/', api['mapa_mesas'], name='mapa_mesas'),
+    path('api/pedidos/sincronizar/', SincronizarPedidosView.as_view(), name='sincronizar_pedidos'),
+    path('api/pedido/<int:pk>/listo/', api['marcar_listo'], name='marcar_listo'),
+    path('api/ticket/<int:pk>/listo/', api['ticket_listo'], name='ticket_listo'),
     path('caja/reporte/', views.ReporteDiarioView.as_view(), name='reporte_ventas'),
+    path('caja/exportar/', views.ExportarVentasView.as_view(), name='exportar_ventas'),
+    path('caja/analitica/', views.AnaliticaView.as_view(), name='analitica'),
     path('caja/pagar/<int:mesa_id>/', views.procesar_pago, name='procesar_pago'), 
-    path('api/pedido/<int:pk>/problema/', views.reportar_problema, name='reportar_problema')
-]
\ No newline at end of file
+    path('api/pedido/<int:pk>/problema/', api['reportar_problema'], name='reportar_problema'),
+    path('metricas/', views.metricas_view, name='metricas'),
+    path('metricas/bd/', views.metricas_bd_view, name='metricas_bd'),
+    path(f"{settings.MEDIA_URL.lstrip('/')}{imagenes.CARPETA}/<path:ruta>", views.miniatura_producto, name='miniatura_producto'),
+]
+
+# Canal en vivo solo bajo ASGI, con un solo worker o un backend entre procesos (core/eventos.py)
+if eventos.disponible():
+    urlpatterns.append(path('api/eventos/', views.eventos_stream, name='eventos'))
+
+if settings.FOODFLOW_SERVIR_MEDIA:
+    urlpatterns.append(path(f"{settings.MEDIA_URL.lstrip('/')}<path:ruta>", views.archivo_media, name='archivo_media'))
\ No newline at end of file
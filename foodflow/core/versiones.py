@@ -0,0 +1,78 @@
+"""
+Contadores de versión (menú, mesas, roles).
+
+Cada vez que algo cambia se genera una versión nueva basada en el reloj, así que
+aunque la caché se vacíe nunca se repite una versión anterior.
+
+Con caché compartida (``FOODFLOW_CACHE_COMPARTIDA``) la versión vive en la caché y
+leerla no toca la BD. Con la caché en memoria de cada proceso, un worker no vería
+los cambios hechos en otro y respondería 304 con datos viejos: la versión se guarda
+en la tabla ``Version`` (una lectura por clave primaria).
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Version
+
+
+def _clave(nombre):
+    return f'foodflow:version:{nombre}'
+
+
+def _nueva():
+    return {'numero': time.time_ns() // 1000, 'modificado': timezone.now().replace(microsecond=0)}
+
+
+def obtener(nombre):
+    """Devuelve {'numero': int, 'modificado': datetime} de la versión actual."""
+    if settings.FOODFLOW_CACHE_COMPARTIDA:
+        return cache.get_or_set(_clave(nombre), _nueva, timeout=None)
+    version = Version.objects.filter(nombre=nombre).values('numero', 'modificado').first()
+    if version is None:
+        fila, _ = Version.objects.get_or_create(nombre=nombre, defaults=_nueva())
+        version = {'numero': fila.numero, 'modificado': fila.modificado}
+    return version
+
+
+async def aobtener(nombre):
+    """Igual que obtener(), para vistas async (no bloquea el event loop)."""
+    if settings.FOODFLOW_CACHE_COMPARTIDA:
+        return await cache.aget_or_set(_clave(nombre), _nueva, timeout=None)
+    version = await Version.objects.filter(nombre=nombre).values('numero', 'modificado').afirst()
+    if version is None:
+        fila, _ = await Version.objects.aget_or_create(nombre=nombre, defaults=_nueva())
+        version = {'numero': fila.numero, 'modificado': fila.modificado}
+    return version
+
+
+def incrementar(nombre):
+    version = _nueva()
+    if settings.FOODFLOW_CACHE_COMPARTIDA:
+        cache.set(_clave(nombre), version, timeout=None)
+    elif not Version.objects.filter(nombre=nombre).update(**version):
+        Version.objects.update_or_create(nombre=nombre, defaults=version)
+    return version
+
+
+def incrementar_al_confirmar(nombre):
+    """
+    Sube la versión cuando se confirma la transacción actual, una sola vez aunque se
+    pida varias (la señal del Pedido y el cambio de estado de la Mesa en services):
+    cada subida de más es un 200 completo para todas las tablets que consultan.
+    """
+    conexion = transaction.get_connection()
+    if conexion.in_atomic_block:
+        # Ya hay una pendiente en este mismo bloque: corre o se revierte junto con esta
+        actuales = set(conexion.savepoint_ids)
+        for savepoints, funcion, *_ in conexion.run_on_commit:
+            if getattr(funcion, 'version', None) == nombre and savepoints == actuales:
+                return
+
+    def subir():
+        incrementar(nombre)
+    subir.version = nombre
+    transaction.on_commit(subir)
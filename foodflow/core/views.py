@@ -1,33 +1,52 @@
 from django.shortcuts import render, get_object_or_404, redirect
-from django.urls import reverse_lazy
+from django.urls import reverse, reverse_lazy
 from django.views.generic import TemplateView, View, ListView
 from django.contrib.auth.views import LoginView
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
-from django.http import JsonResponse
+from django.conf import settings
+from django.http import Http404, HttpResponse, HttpResponseNotModified, JsonResponse, StreamingHttpResponse
+import asyncio
 import json
+import logging
+import time
 from django.views.decorators.csrf import csrf_exempt
+from django.utils.cache import patch_cache_control
 from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition, require_POST
 from django.contrib.auth import logout
-from django.db.models import Sum
-from datetime import date
+from django.utils import timezone
+from datetime import date, timedelta
 from django.contrib import messages
 from django.views.decorators.csrf import csrf_exempt
+from django.core.handlers.asgi import ASGIRequest
+from asgiref.sync import sync_to_async
+import os
+from django.db import connection
+
+from foodflowdatos import database
 
 # Importamos tus modelos
-from .models import Mesa, Categoria, Producto, Pedido, DetallePedido, Venta
+from .models import Mesa, Categoria, Producto, Pedido, DetallePedido, Venta, Estacion, TicketEstacion
+from . import analitica, catalogo, estaticos, eventos, exportar, feeds, imagenes, metricas, reportes, roles, services, versiones
+
+logger = logging.getLogger(__name__)
 
 # --- 1. SEGURIDAD (MIXINS) ---
-class SoloCajaMixin(UserPassesTestMixin):
-    def test_func(self):
-        return self.request.user.is_superuser or self.request.user.groups.filter(name='Caja').exists()
+# Los roles se resuelven una vez y quedan cacheados (ver core/roles.py)
+class RolRequeridoMixin(UserPassesTestMixin):
+    rol = None
 
-class SoloCocinaMixin(UserPassesTestMixin):
     def test_func(self):
-        return self.request.user.is_superuser or self.request.user.groups.filter(name='Cocina').exists()
+        return roles.tiene_rol(self.request.user, self.rol)
 
-class SoloMeseroMixin(UserPassesTestMixin):
-    def test_func(self):
-        return self.request.user.is_superuser or self.request.user.groups.filter(name='Mesero').exists()
+class SoloCajaMixin(RolRequeridoMixin):
+    rol = roles.CAJA
+
+class SoloCocinaMixin(RolRequeridoMixin):
+    rol = roles.COCINA
+
+class SoloMeseroMixin(RolRequeridoMixin):
+    rol = roles.MESERO
 
 # --- 2. VISTA DE LOGIN ---
 class CustomLoginView(LoginView):
@@ -36,16 +55,20 @@ class CustomLoginView(LoginView):
 
     def get_success_url(self):
         user = self.request.user
-        if user.is_superuser or user.groups.filter(name='Caja').exists():
+        if roles.tiene_rol(user, roles.CAJA):
             return reverse_lazy('reporte_ventas')
-        elif user.groups.filter(name='Cocina').exists():
+        elif roles.tiene_rol(user, roles.COCINA):
             return reverse_lazy('cocina')
-        elif user.groups.filter(name='Mesero').exists():
+        elif roles.tiene_rol(user, roles.MESERO):
             return reverse_lazy('mesero')
         return reverse_lazy('index')
 
 # --- 3. VISTAS PRINCIPALES (FUSIONADAS) ---
 
+def _url_eventos():
+    # Vacía si no hay canal en vivo: la plantilla no abre EventSource y se queda con el polling
+    return reverse('eventos') if eventos.disponible() else ''
+
 # Vista MESERO: Seguridad + Datos de Mesas/Categorías + Template Correcto
 class MeseroView(SoloMeseroMixin, ListView):
     template_name = "mesero/mesero.html"
@@ -54,7 +77,11 @@ class MeseroView(SoloMeseroMixin, ListView):
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['categorias'] = Categoria.objects.prefetch_related('productos').all()
+        # Menú cacheado: solo se reconstruye cuando cambia un producto o categoría
+        catalogo_actual = catalogo.obtener_catalogo()
+        context['categorias'] = catalogo_actual['categorias']
+        context['version_catalogo'] = catalogo_actual['version']
+        context['url_eventos'] = _url_eventos()
         
         # --- LÓGICA PARA EL SIGUIENTE ID ---
         ultimo_pedido = Pedido.objects.last()
@@ -68,32 +95,127 @@ class MeseroView(SoloMeseroMixin, ListView):
         
         return context
 
+# Menú en JSON para las tablets: con ETag/Last-Modified responde 304 si no cambió
+def _version_menu(request):
+    # ETag y Last-Modified salen de la misma lectura
+    if not hasattr(request, '_version_menu'):
+        request._version_menu = versiones.obtener('catalogo')
+    return request._version_menu
+
+def _etag_menu(request):
+    return f'"catalogo-{_version_menu(request)["numero"]}"'
+
+def _modificado_menu(request):
+    return _version_menu(request)['modificado']
+
+@method_decorator(condition(etag_func=_etag_menu, last_modified_func=_modificado_menu), name='get')
+class MenuApiView(SoloMeseroMixin, View):
+    def get(self, request):
+        # Misma versión que el ETag: una sola lectura por petición
+        catalogo_actual = catalogo.obtener_catalogo(_version_menu(request))
+        response = JsonResponse({
+            'version': catalogo_actual['version'],
+            'categorias': catalogo_actual['categorias'],
+        })
+        # La tablet siempre revalida, pero casi siempre recibe un 304 vacío
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
 # Vista COCINA: Seguridad + Datos de Pedidos + Template Correcto
+# /cocina/ es el monitor general; /cocina/<slug>/ la pantalla de una estación (solo sus tickets)
 class CocinaView(SoloCocinaMixin, TemplateView):
     template_name = "cocina/cocina.html"
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['pedidos'] = Pedido.objects.filter(
-            estado__in=['pendiente', 'preparacion']
+        context['estaciones'] = list(Estacion.objects.all())
+        context['url_eventos'] = _url_eventos()
+        if kwargs.get('estacion'):
+            estacion = get_object_or_404(Estacion, slug=kwargs['estacion'])
+            context['estacion'] = estacion
+            context['tickets'] = feeds.tickets_abiertos(estacion).order_by('creado_en')
+            context['cursor'] = feeds.cursor_actual(feeds.tickets_estacion(estacion))
+            return context
+
+        # Misma carga que el feed: detalles y productos precargados (sin N+1)
+        context['pedidos'] = feeds.pedidos_cocina().filter(
+            estado__in=feeds.ESTADOS_COCINA
         ).order_by('creado_en') # <--- CORREGIDO: Usamos 'creado_en'
+        context['cursor'] = feeds.cursor_actual()
         return context
 
+# Feed JSON de COCINA: solo lo que cambió desde el cursor
+class CocinaFeedView(SoloCocinaMixin, View):
+    def get(self, request, estacion=None):
+        try:
+            if estacion:
+                data = feeds.feed_estacion(
+                    get_object_or_404(Estacion, slug=estacion), request.GET.get('cursor'), request=request
+                )
+            else:
+                data = feeds.feed_cocina(request.GET.get('cursor'), request=request)
+        except feeds.CursorInvalido as e:
+            return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
+        return JsonResponse(data)
+
 # Vista REPORTES: Seguridad + Datos de Ventas
 class ReporteDiarioView(SoloCajaMixin, TemplateView):
     template_name = 'core/reporte_ventas.html'
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        hoy = date.today()
-        ventas_hoy = Venta.objects.filter(fecha_venta__date=hoy)
-        total_dia = ventas_hoy.aggregate(Sum('total'))['total__sum'] or 0
+        # Hoy en hora de Guayaquil, o el día pedido con ?fecha=YYYY-MM-DD
+        try:
+            fecha = date.fromisoformat(self.request.GET['fecha'])
+        except (KeyError, ValueError):
+            fecha = timezone.localdate()
+
+        # Totales desde el resumen por hora (no recorre las ventas)
+        resumen = reportes.resumen_dia(fecha)
         
-        context['ventas'] = ventas_hoy
-        context['total_dia'] = total_dia
-        context['fecha'] = hoy
+        context['ventas'] = reportes.todas_las_ventas_del_dia(fecha)
+        context['total_dia'] = resumen['total']
+        context['por_metodo'] = resumen['por_metodo']
+        context['fecha'] = fecha
         return context
 
+# Exportación para contabilidad: ?desde=YYYY-MM-DD&hasta=YYYY-MM-DD&metodo=efectivo&formato=csv|ndjson
+# Se envía en streaming, así que un año de ventas no se carga entero en memoria
+class ExportarVentasView(SoloCajaMixin, View):
+    def get(self, request):
+        hoy = timezone.localdate()
+        try:
+            desde = date.fromisoformat(request.GET.get('desde') or hoy.isoformat())
+            hasta = date.fromisoformat(request.GET.get('hasta') or desde.isoformat())
+        except ValueError:
+            return JsonResponse({'status': 'error', 'message': 'Fechas en formato YYYY-MM-DD.'}, status=400)
+        formato = request.GET.get('formato', 'csv')
+        if hasta < desde or formato not in exportar.FORMATOS:
+            return JsonResponse({'status': 'error', 'message': 'Rango de fechas o formato inválido.'}, status=400)
+
+        lineas = exportar.exportar(desde, hasta, request.GET.get('metodo') or None, formato)
+        if isinstance(request, ASGIRequest):
+            lineas = exportar.en_lotes(lineas)
+        response = StreamingHttpResponse(lineas, content_type=exportar.FORMATOS[formato])
+        response['Content-Disposition'] = f'attachment; filename="ventas_{desde}_{hasta}.{formato}"'
+        return response
+
+# Analítica para gerencia (JSON): ?desde=YYYY-MM-DD&hasta=YYYY-MM-DD, por defecto los últimos 30 días
+class AnaliticaView(SoloCajaMixin, View):
+    MAXIMO_DIAS = 731
+
+    def get(self, request):
+        hoy = timezone.localdate()
+        try:
+            hasta = date.fromisoformat(request.GET.get('hasta') or hoy.isoformat())
+            desde = date.fromisoformat(request.GET['desde']) if request.GET.get('desde') else hasta - timedelta(days=29)
+        except ValueError:
+            return JsonResponse({'status': 'error', 'message': 'Fechas en formato YYYY-MM-DD.'}, status=400)
+        if hasta < desde or (hasta - desde).days >= self.MAXIMO_DIAS:
+            return JsonResponse({'status': 'error', 'message': 'Rango de fechas inválido (máximo 2 años).'}, status=400)
+
+        return JsonResponse({'status': 'ok', **analitica.analizar(desde, hasta)})
+
 # --- 4. API (LÓGICA INTERNA PARA JS) ---
 
 # En core/views.py
@@ -103,63 +225,227 @@ class CrearPedidoView(View):
     def post(self, request):
         try:
             data = json.loads(request.body)
-            mesa_id = data.get('mesa_id')
-            items = data.get('items')
-            nota=data.get('notas', ''),
-            urgente=data.get('urgente', False),
-            metodo_pago = data.get('metodo_pago', 'efectivo') 
-            cliente_cedula=data.get('cliente_cedula', '') 
-
-            mesa = get_object_or_404(Mesa, id=mesa_id)
-            
-            # 1. Crear Pedido
-            pedido = Pedido.objects.create(
-                mesa=mesa,
-                usuario=request.user 
-            )
-            
-            # 2. Guardar productos y sumar
-            total_venta = 0
-            for item in items:
-                prod = Producto.objects.get(id=item['id'])
-                cant = int(item['cantidad'])
-                total_venta += prod.precio * cant
-                
-                DetallePedido.objects.create(pedido=pedido, producto=prod, cantidad=cant)
-            
-            # 3. GUARDAR VENTA (Aquí suele fallar si falta migración)
-            total_con_iva = float(total_venta) * 1.15
-            
-            Venta.objects.create(
-                pedido=pedido,
-                total=total_con_iva,
-                metodo_pago=metodo_pago
-            )
+            usuario = request.user if request.user.is_authenticated else None
+            # La tablet manda un Idempotency-Key por pedido: si reintenta, no se duplica
+            clave = request.headers.get('Idempotency-Key') or None
 
-            # 4. Mesa Ocupada
-            mesa.estado = 'esperando'
-            mesa.save()
+            # Todo el pedido (detalles, venta y mesa) se guarda en una sola transacción
+            respuesta, repetida = services.registrar_pedido(data, usuario=usuario, clave=clave)
 
-            return JsonResponse({'status': 'ok'})
+            # Devolvemos los totales calculados en el servidor
+            response = JsonResponse(respuesta)
+            if repetida:
+                response['Idempotent-Replayed'] = 'true'
+            return response
+
+        except services.ClaveReutilizada as e:
+            return JsonResponse({'status': 'error', 'message': str(e)}, status=422)
+
+        except ValueError as e:
+            # JSON mal formado o datos inválidos (PedidoInvalido)
+            return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
 
-        except Exception as e:
-            # Esto imprimirá el error real en tu pantalla negra (terminal)
-            print(f"❌ ERROR AL CREAR PEDIDO: {str(e)}")
-            return JsonResponse({'status': 'error', 'message': str(e)}, status=500)
+        except Exception:
+            # El detalle va al log con el traceback; a la tablet solo un mensaje genérico
+            logger.exception('Error al crear pedido')
+            return JsonResponse({'status': 'error', 'message': 'Error interno al crear el pedido'}, status=500)
+
+# Cola offline de la tablet: todos los pedidos pendientes en un solo viaje
+@method_decorator(csrf_exempt, name='dispatch')
+class SincronizarPedidosView(View):
+    def post(self, request):
+        try:
+            data = json.loads(request.body)
+            usuario = request.user if request.user.is_authenticated else None
+            resultados = services.sincronizar_pedidos(data.get('pedidos'), usuario=usuario)
+        except (ValueError, AttributeError) as e:
+            return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
+        return JsonResponse({'status': 'ok', 'resultados': resultados})
 
 @method_decorator(csrf_exempt, name='dispatch')
 class ActualizarEstadoPedido(View):
     def post(self, request, pk):
-        pedido = get_object_or_404(Pedido, pk=pk)
-        pedido.estado = 'listo'
-        pedido.save()
-        
-        mesa = pedido.mesa
-        mesa.estado = 'lista'
-        mesa.save()
-        
+        try:
+            services.marcar_listo(pk)
+        except Pedido.DoesNotExist:
+            return JsonResponse({'status': 'error', 'msg': 'Pedido no encontrado'}, status=404)
+        except services.TransicionInvalida as e:
+            return JsonResponse({'status': 'error', 'msg': str(e)}, status=409)
         return JsonResponse({'status': 'updated'})
 
+# Una estación terminó su parte del pedido
+@method_decorator(csrf_exempt, name='dispatch')
+class TicketListoView(View):
+    def post(self, request, pk):
+        try:
+            services.marcar_ticket_listo(pk)
+        except TicketEstacion.DoesNotExist:
+            return JsonResponse({'status': 'error', 'msg': 'Ticket no encontrado'}, status=404)
+        except services.TransicionInvalida as e:
+            return JsonResponse({'status': 'error', 'msg': str(e)}, status=409)
+        return JsonResponse({'status': 'updated'})
+
+# Mapa de mesas para las tablets: estado, pedido abierto y minutos de cada mesa en una consulta.
+# La tablet manda ?version=N (o If-None-Match): si no se movió nada responde 304 vacío.
+# Sin caché compartida la versión sale de la tabla Version (core/versiones.py): los workers no se desincronizan.
+def _mesas_sin_cambios(request, version):
+    return request.GET.get('version') == str(version) or request.headers.get('If-None-Match') == f'"mesas-{version}"'
+
+def _respuesta_mesas(data):
+    response = JsonResponse({'status': 'ok', **data})
+    response['ETag'] = f'"mesas-{data["version"]}"'
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+def mapa_mesas(request):
+    if not request.user.is_authenticated:
+        return JsonResponse({'status': 'error', 'msg': 'No autenticado'}, status=401)
+    # La versión se lee antes que las mesas: si algo cambia en medio, la próxima consulta lo trae
+    version = versiones.obtener('mesas')['numero']
+    if _mesas_sin_cambios(request, version):
+        return HttpResponseNotModified()
+    return _respuesta_mesas(feeds.serializar_mesas(feeds.mesas_con_pedido(), version))
+
+# --- API ASÍNCRONA (ASGI) ---
+# Las mismas rutas que la API de arriba, pero sin ocupar un hilo mientras se espera a la BD.
+# Se activan con FOODFLOW_ASGI=1 (start_asgi.sh, uvicorn). Las escrituras siguen pasando
+# por services dentro de sync_to_async: el ORM async de Django no tiene transacciones.
+
+@csrf_exempt
+@require_POST
+async def crear_pedido_async(request):
+    try:
+        data = json.loads(request.body)
+        user = await request.auser()
+        usuario = user if user.is_authenticated else None
+        clave = request.headers.get('Idempotency-Key') or None
+        respuesta, repetida = await sync_to_async(services.registrar_pedido)(data, usuario=usuario, clave=clave)
+    except services.ClaveReutilizada as e:
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=422)
+    except ValueError as e:
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
+    except Exception:
+        # Igual que CrearPedidoView: traceback al log, mensaje genérico a la tablet
+        logger.exception('Error al crear pedido')
+        return JsonResponse({'status': 'error', 'message': 'Error interno al crear el pedido'}, status=500)
+
+    response = JsonResponse(respuesta)
+    if repetida:
+        response['Idempotent-Replayed'] = 'true'
+    return response
+
+@csrf_exempt
+@require_POST
+async def marcar_listo_async(request, pk):
+    try:
+        await sync_to_async(services.marcar_listo)(pk)
+    except Pedido.DoesNotExist:
+        return JsonResponse({'status': 'error', 'msg': 'Pedido no encontrado'}, status=404)
+    except services.TransicionInvalida as e:
+        return JsonResponse({'status': 'error', 'msg': str(e)}, status=409)
+    return JsonResponse({'status': 'updated'})
+
+@csrf_exempt
+@require_POST
+async def ticket_listo_async(request, pk):
+    try:
+        await sync_to_async(services.marcar_ticket_listo)(pk)
+    except TicketEstacion.DoesNotExist:
+        return JsonResponse({'status': 'error', 'msg': 'Ticket no encontrado'}, status=404)
+    except services.TransicionInvalida as e:
+        return JsonResponse({'status': 'error', 'msg': str(e)}, status=409)
+    return JsonResponse({'status': 'updated'})
+
+@csrf_exempt
+@require_POST
+async def reportar_problema_async(request, pk):
+    try:
+        await sync_to_async(services.reportar_problema)(pk)
+    except Pedido.DoesNotExist:
+        return JsonResponse({'status': 'error', 'msg': 'Pedido no encontrado'}, status=404)
+    except services.TransicionInvalida as e:
+        return JsonResponse({'status': 'error', 'msg': str(e)}, status=409)
+    return JsonResponse({'status': 'ok'})
+
+# Solo lectura: ORM async directo
+async def mapa_mesas_async(request):
+    user = await request.auser()
+    if not user.is_authenticated:
+        return JsonResponse({'status': 'error', 'msg': 'No autenticado'}, status=401)
+    version = (await versiones.aobtener('mesas'))['numero']
+    if _mesas_sin_cambios(request, version):
+        return HttpResponseNotModified()
+    filas = [fila async for fila in feeds.mesas_con_pedido()]
+    return _respuesta_mesas(feeds.serializar_mesas(filas, version))
+
+# --- EVENTOS EN VIVO (SSE) ---
+# Las pantallas se conectan una vez y reciben los cambios al instante.
+# Solo con eventos.disponible(): bajo WSGI ocuparía un worker por pantalla.
+# Cada conexión dura DURACION_EVENTOS; el navegador se reconecta solo (retry).
+DURACION_EVENTOS = 5 * 60
+
+async def eventos_stream(request):
+    if not eventos.disponible():
+        raise Http404('Eventos en vivo no disponibles')
+    user = await request.auser()
+    if not user.is_authenticated:
+        return JsonResponse({'status': 'error', 'msg': 'No autenticado'}, status=401)
+
+    canales = [c for c in request.GET.getlist('canal') if c in eventos.CANALES] or list(eventos.CANALES)
+    suscripcion = eventos.get_backend().suscribir(canales)
+
+    async def stream():
+        fin = time.monotonic() + DURACION_EVENTOS
+        try:
+            yield 'retry: 3000\n\n'
+            while (restante := fin - time.monotonic()) > 0:
+                try:
+                    mensaje = await asyncio.wait_for(anext(suscripcion), timeout=min(15, restante))
+                except asyncio.TimeoutError:
+                    # Latido para que proxies y tablets no corten la conexión
+                    yield ': ping\n\n'
+                    continue
+                yield f'data: {json.dumps(mensaje)}\n\n'
+        finally:
+            suscripcion.cerrar()
+
+    response = StreamingHttpResponse(stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+# --- MÉTRICAS (Prometheus) ---
+# Con FOODFLOW_METRICAS_TOKEN se accede con "Authorization: Bearer <token>"; si no, solo staff
+def _metricas_autorizadas(request):
+    token = settings.FOODFLOW_METRICAS_TOKEN
+    if token:
+        return request.headers.get('Authorization') == f'Bearer {token}'
+    return request.user.is_staff
+
+
+def metricas_view(request):
+    if not _metricas_autorizadas(request):
+        return HttpResponse('No autorizado', status=403, content_type='text/plain')
+    return HttpResponse(metricas.registro.como_prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+# Conexiones del worker que atiende la petición (pool, persistentes, pragmas de SQLite)
+def metricas_bd_view(request):
+    if not _metricas_autorizadas(request):
+        return HttpResponse('No autorizado', status=403, content_type='text/plain')
+    return JsonResponse(database.estadisticas(connection))
+
+# Miniaturas de productos: el nombre lleva el hash del contenido, así que nunca cambian
+# y el navegador puede guardarlas un año sin volver a preguntar
+def miniatura_producto(request, ruta):
+    return estaticos.servir(
+        request, ruta, os.path.join(settings.MEDIA_ROOT, imagenes.CARPETA), cache_control=estaticos.CACHE_INMUTABLE,
+    )
+
+# Resto de media (fotos originales) en producción: 304 con ETag y descargas por rangos
+def archivo_media(request, ruta):
+    return estaticos.servir(request, ruta, settings.MEDIA_ROOT)
+
 # --- 5. LOGOUT Y OTROS ---
 
 def exit_view(request):
@@ -167,59 +453,26 @@ def exit_view(request):
     return redirect('login')
 
 # Vista para procesar el pago (Requerida para el botón de Caja)
+# Todo el cobro vive en services.cobrar_mesa: bloquea la mesa y no cobra dos veces
 def procesar_pago(request, mesa_id):
-    from django.contrib import messages
-    mesa = get_object_or_404(Mesa, id=mesa_id)
-    pedido = Pedido.objects.filter(mesa=mesa).exclude(estado='pagado').last()
-    
-    if pedido:
-        Venta.objects.create(pedido=pedido, total=pedido.total_pedido)
-        pedido.estado = 'pagado'
-        pedido.save()
-        mesa.estado = 'libre'
-        mesa.save()
-        messages.success(request, f"Pago registrado. Mesa {mesa.numero} liberada.")
+    try:
+        pedidos = services.cobrar_mesa(mesa_id)
+    except Mesa.DoesNotExist:
+        messages.error(request, "La mesa no existe.")
+    except services.TransicionInvalida as e:
+        messages.error(request, str(e))
     else:
-        messages.error(request, "No hay pedidos pendientes.")
-    
-    return redirect('reporte_ventas') 
+        messages.success(request, f"Cobro registrado ({len(pedidos)} pedido(s)) y mesa liberada.")
 
-
-def procesar_pago(request, mesa_id):
-    mesa = get_object_or_404(Mesa, id=mesa_id)
-    # Buscamos el último pedido de esta mesa
-    pedido = Pedido.objects.filter(mesa=mesa).last()
-    
-    if pedido:
-        # VERIFICACIÓN INTELIGENTE:
-        # Si ya existe una venta para este pedido (porque pagó al inicio), solo liberamos mesa.
-        if Venta.objects.filter(pedido=pedido).exists():
-             mesa.estado = 'libre'
-             mesa.save()
-             # Opcional: Marcar pedido como finalizado del todo si tienes ese estado
-             pedido.estado = 'pagado'
-             pedido.save()
-             messages.success(request, f"Mesa {mesa.numero} liberada correctamente.")
-        
-        else:
-            # Si NO existe venta (flujo antiguo), entonces cobramos aquí
-            Venta.objects.create(pedido=pedido, total=pedido.total_pedido, metodo_pago='efectivo')
-            pedido.estado = 'pagado'
-            pedido.save()
-            mesa.estado = 'libre'
-            mesa.save()
-            messages.success(request, "Cobro registrado y mesa liberada.")
-            
     return redirect('mesero') # Regresamos al mapa de mesas
 
 @csrf_exempt
 def reportar_problema(request, pk):
     if request.method == 'POST':
         try:
-            pedido = Pedido.objects.get(pk=pk)
-            # Puedes usar un estado nuevo o simplemente cambiar la nota
-            pedido.estado = 'problema' # Asegúrate de que tu modelo soporte este estado o usa 'pendiente'
-            pedido.save()
+            services.reportar_problema(pk)
             return JsonResponse({'status': 'ok'})
         except Pedido.DoesNotExist:
-            return JsonResponse({'status': 'error', 'msg': 'Pedido no encontrado'}, status=404)
\ No newline at end of file
+            return JsonResponse({'status': 'error', 'msg': 'Pedido no encontrado'}, status=404)
+        except services.TransicionInvalida as e:
+            return JsonResponse({'status': 'error', 'msg': str(e)}, status=409)
\ No newline at end of file
@@ -3,6 +3,12 @@ ASGI config for foodflow project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+``start_asgi.sh`` runs it with uvicorn workers and sets ``FOODFLOW_ASGI=1`` so the
+tablet API uses the async views. The live order events endpoint (``/api/eventos/``,
+Server-Sent Events) is only routed under ``FOODFLOW_ASGI=1``, either with a single
+worker (the default, in-memory broker) or with
+``FOODFLOW_EVENTOS_BACKEND=core.eventos.PostgresBackend``; otherwise the screens poll.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/6.0/howto/deployment/asgi/
 """
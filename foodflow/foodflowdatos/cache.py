@@ -0,0 +1,67 @@
+"""
+Configuración de la caché (``CACHE_URL`` en el entorno), igual que database.py.
+
+- Sin ``CACHE_URL`` o ``locmem://``: memoria del proceso. Cada worker tiene la suya,
+  así que las invalidaciones (menú, mesas, roles) solo llegan al worker que las hizo;
+  sirve para un solo proceso o para desarrollo.
+- ``file:///ruta/carpeta``: archivos en disco, compartida entre los workers de una
+  misma máquina (sin servicios extra).
+- ``redis://host:6379/0`` (o ``rediss://``): compartida entre máquinas. Necesita ``redis``.
+- ``memcached://host:11211``: compartida. Necesita ``pymemcache``.
+- ``dummy://``: sin caché (para medir o depurar).
+
+Sobre esta caché van las sesiones (``cached_db``), los usuarios
+(core/autenticacion.py), los roles, el menú, las versiones y la analítica. Lo que
+necesita que una invalidación llegue a todos los workers (versiones, usuario de la
+sesión, roles, parciales de la analítica) solo se guarda aquí si la caché es
+compartida (:func:`compartida`).
+"""
+import os
+from urllib.parse import urlsplit
+
+from django.core.exceptions import ImproperlyConfigured
+
+# La analítica guarda un parcial por día (un año = 365 claves) más tarjetas y menú:
+# el máximo por defecto de Django (300) haría que se borren entre sí
+MAXIMO_ENTRADAS = 10000
+
+BACKENDS = {
+    'locmem': 'django.core.cache.backends.locmem.LocMemCache',
+    'file': 'django.core.cache.backends.filebased.FileBasedCache',
+    'redis': 'django.core.cache.backends.redis.RedisCache',
+    'rediss': 'django.core.cache.backends.redis.RedisCache',
+    'memcached': 'django.core.cache.backends.memcached.PyMemcacheCache',
+    'dummy': 'django.core.cache.backends.dummy.DummyCache',
+}
+
+# Esquemas que ven todos los workers (file: solo los de la misma máquina)
+COMPARTIDAS = ('file', 'redis', 'rediss', 'memcached')
+
+
+def configuracion(entorno=None):
+    """Diccionario de ``CACHES['default']`` a partir de ``CACHE_URL``."""
+    entorno = os.environ if entorno is None else entorno
+    url = entorno.get('CACHE_URL') or 'locmem://'
+    partes = urlsplit(url)
+    backend = BACKENDS.get(partes.scheme)
+    if backend is None:
+        raise ImproperlyConfigured(f'CACHE_URL con esquema desconocido: {partes.scheme!r} ({", ".join(BACKENDS)}).')
+
+    config = {'BACKEND': backend, 'KEY_PREFIX': entorno.get('CACHE_PREFIJO', '')}
+    if partes.scheme == 'locmem':
+        config['LOCATION'] = partes.netloc or 'foodflow'
+        config['OPTIONS'] = {'MAX_ENTRIES': MAXIMO_ENTRADAS}
+    elif partes.scheme == 'file':
+        config['LOCATION'] = partes.path
+        config['OPTIONS'] = {'MAX_ENTRIES': MAXIMO_ENTRADAS}
+    elif partes.scheme in ('redis', 'rediss'):
+        config['LOCATION'] = url
+    elif partes.scheme == 'memcached':
+        config['LOCATION'] = partes.netloc
+    return config
+
+
+def compartida(entorno=None):
+    """True si ``CACHE_URL`` apunta a una caché que comparten todos los workers."""
+    entorno = os.environ if entorno is None else entorno
+    return urlsplit(entorno.get('CACHE_URL') or 'locmem://').scheme in COMPARTIDAS
@@ -0,0 +1,111 @@
+"""
+Configuración de la base de datos (una sola fuente: las variables de entorno).
+
+- ``DATABASE_URL``: PostgreSQL en producción. Si no está, SQLite en ``db.sqlite3``.
+- ``DB_CONN_MAX_AGE``: segundos que cada worker reutiliza su conexión (600 por defecto).
+  Antes de reutilizarla se comprueba que siga viva (``CONN_HEALTH_CHECKS``).
+- ``DB_POOL=1``: pool de conexiones de Django (Django >= 5.1 y ``psycopg[pool]``, ya en requirements.txt).
+  El tamaño por worker sale de ``DB_MAX_CONEXIONES`` (las que le tocan a la app en el
+  servidor) repartidas entre ``WEB_CONCURRENCY`` workers de gunicorn.
+- ``DB_PGBOUNCER=1``: detrás de PgBouncer en modo transacción no hay cursores del
+  lado del servidor (la exportación de ventas pasa a leer por lotes normales).
+
+En SQLite (local / sin internet) se activa WAL y un busy_timeout al abrir cada conexión.
+"""
+import importlib.util
+import os
+
+import dj_database_url
+from django.core.exceptions import ImproperlyConfigured
+
+PRAGMAS_SQLITE = (
+    # Lectores y escritor no se bloquean entre sí (cocina leyendo mientras un mesero guarda)
+    'PRAGMA journal_mode=WAL',
+    # Con WAL es seguro y evita un fsync por cada commit
+    'PRAGMA synchronous=NORMAL',
+    # Esperar al otro escritor en vez de fallar con "database is locked"
+    'PRAGMA busy_timeout=5000',
+    'PRAGMA temp_store=MEMORY',
+    'PRAGMA cache_size=-20000',
+)
+
+
+def _activo(valor):
+    return str(valor).strip().lower() in ('1', 'true', 'si', 'sí', 'yes', 'on')
+
+
+def tamano_pool(entorno):
+    """(min_size, max_size) del pool de cada worker."""
+    workers = max(1, int(entorno.get('WEB_CONCURRENCY', 1)))
+    total = int(entorno.get('DB_MAX_CONEXIONES', 20))
+    maximo = int(entorno.get('DB_POOL_MAX', max(2, total // workers)))
+    minimo = min(maximo, int(entorno.get('DB_POOL_MIN', 2)))
+    return minimo, maximo
+
+
+def configuracion(base_dir, entorno=None):
+    """Diccionario de ``DATABASES['default']`` a partir del entorno."""
+    entorno = os.environ if entorno is None else entorno
+    url = entorno.get('DATABASE_URL') or f"sqlite:///{base_dir / 'db.sqlite3'}"
+    pool = _activo(entorno.get('DB_POOL', ''))
+
+    config = dj_database_url.parse(
+        url,
+        # El pool de Django no admite conexiones persistentes: es uno u otro
+        conn_max_age=0 if pool else int(entorno.get('DB_CONN_MAX_AGE', 600)),
+        conn_health_checks=not pool,
+        disable_server_side_cursors=_activo(entorno.get('DB_PGBOUNCER', '')),
+    )
+
+    if pool:
+        if config['ENGINE'] != 'django.db.backends.postgresql':
+            raise ImproperlyConfigured('DB_POOL solo se puede usar con PostgreSQL.')
+        if importlib.util.find_spec('psycopg_pool') is None:
+            raise ImproperlyConfigured('DB_POOL=1 necesita psycopg 3 con el pool: pip install "psycopg[binary,pool]".')
+        minimo, maximo = tamano_pool(entorno)
+        config.setdefault('OPTIONS', {})['pool'] = {
+            'min_size': minimo,
+            'max_size': maximo,
+            # Segundos esperando una conexión libre antes de fallar
+            'timeout': int(entorno.get('DB_POOL_TIMEOUT', 10)),
+        }
+    return config
+
+
+def aplicar_pragmas(sender, connection, **kwargs):
+    """Receptor de ``connection_created``: pragmas de SQLite en cada conexión nueva."""
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for pragma in PRAGMAS_SQLITE:
+            cursor.execute(pragma)
+
+
+def estadisticas(connection):
+    """Estado de la conexión/pool del worker actual, para dimensionar los workers."""
+    config = connection.settings_dict
+    datos = {
+        'motor': connection.vendor,
+        'workers': int(os.environ.get('WEB_CONCURRENCY', 1)),
+        'conn_max_age': config['CONN_MAX_AGE'],
+        'conn_health_checks': config['CONN_HEALTH_CHECKS'],
+        'pool': None,
+    }
+
+    # Django >= 5.1 expone el pool de psycopg (None si no se usa)
+    pool = getattr(connection, 'pool', None)
+    if pool is not None:
+        datos['pool'] = pool.get_stats()
+
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute('SHOW max_connections')
+            datos['max_conexiones_servidor'] = int(cursor.fetchone()[0])
+            cursor.execute('SELECT count(*) FROM pg_stat_activity WHERE datname = current_database()')
+            datos['conexiones_abiertas'] = cursor.fetchone()[0]
+        elif connection.vendor == 'sqlite':
+            datos['pragmas'] = {}
+            for nombre in ('journal_mode', 'synchronous', 'busy_timeout'):
+                cursor.execute(f'PRAGMA {nombre}')
+                datos['pragmas'][nombre] = cursor.fetchone()[0]
+    return datos
@@ -11,21 +11,13 @@ https://docs.djangoproject.com/en/6.0/ref/settings/
 """
 import os
 from pathlib import Path
-import dj_database_url
+
+from . import cache, database
 
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
-
-DATABASES = {
-    'default': dj_database_url.config(
-        # Esto permite usar SQLite en tu PC y PostgreSQL en Render automáticamente
-        default='sqlite:///db.sqlite3',
-        conn_max_age=600
-    )
-}
-
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/6.0/howto/deployment/checklist/
 
@@ -52,7 +44,10 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
-    'whitenoise.middleware.WhiteNoiseMiddleware',
+    # WhiteNoise con soporte async (ver core/middleware.py)
+    'core.middleware.EstaticosMiddleware',
+    # Mide consultas/tiempos por vista (después de WhiteNoise para no contar estáticos)
+    "core.middleware.InstrumentacionMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
@@ -67,12 +62,22 @@ TEMPLATES = [
     {
         "BACKEND": "django.template.backends.django.DjangoTemplates",
         "DIRS": [],
-        "APP_DIRS": True,
         "OPTIONS": {
+            # Plantillas compiladas una sola vez por proceso (en DEBUG se recargan al editarlas)
+            "loaders": [
+                (
+                    "django.template.loaders.cached.Loader",
+                    [
+                        "django.template.loaders.filesystem.Loader",
+                        "django.template.loaders.app_directories.Loader",
+                    ],
+                ),
+            ],
             "context_processors": [
                 "django.template.context_processors.request",
                 "django.contrib.auth.context_processors.auth",
                 "django.contrib.messages.context_processors.messages",
+                "core.context_processors.roles",
             ],
         },
     },
@@ -83,13 +88,32 @@ WSGI_APPLICATION = "foodflowdatos.wsgi.application"
 
 # Database
 # https://docs.djangoproject.com/en/6.0/ref/settings/#databases
+# SQLite en tu PC y PostgreSQL en Render (DATABASE_URL); ver foodflowdatos/database.py
 
 DATABASES = {
-    "default": {
-        "ENGINE": "django.db.backends.sqlite3",
-        "NAME": BASE_DIR / "db.sqlite3",
-    }
+    "default": database.configuracion(BASE_DIR),
+}
+
+
+# Caché, sesiones y usuario de la sesión
+# Memoria del proceso por defecto; con varios workers o máquinas, CACHE_URL a redis/memcached
+# (ver foodflowdatos/cache.py)
+
+CACHES = {
+    "default": cache.configuracion(),
 }
+# Con caché en memoria del proceso, las versiones (menú, mesas, roles) van a la BD
+# y el usuario de la sesión no se cachea: si no, cada worker tendría las suyas
+FOODFLOW_CACHE_COMPARTIDA = cache.compartida()
+
+# La sesión se lee de la caché y se escribe también en la BD (no se pierde si se vacía la caché)
+SESSION_ENGINE = "django.contrib.sessions.backends.cached_db"
+
+# Igual que ModelBackend, pero con caché compartida el usuario de cada petición sale de
+# la caché (core/autenticacion.py); con la caché en memoria lo busca en la BD
+AUTHENTICATION_BACKENDS = [
+    "core.autenticacion.CacheModelBackend",
+]
 
 
 # Password validation
@@ -127,18 +151,63 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/6.0/howto/static-files/
 
 STATIC_URL = 'static/'
-if not DEBUG:
-    STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
-    STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
+STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
+
+# collectstatic deja cada archivo con hash en el nombre y su .gz/.br al lado;
+# WhiteNoise los sirve con caché immutable (ver core/estaticos.py y manage.py revisar_estaticos)
+STORAGES = {
+    "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+    "staticfiles": {"BACKEND": "core.estaticos.EstaticosStorage"},
+}
 
 LOGIN_REDIRECT_URL = 'mesero'
 LOGOUT_REDIRECT_URL = 'login'
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+# Las fotos las sirve Django también en producción (con 304 y rangos, core/estaticos.py).
+# Poner FOODFLOW_SERVIR_MEDIA=0 si las entrega nginx o un CDN.
+FOODFLOW_SERVIR_MEDIA = os.environ.get('FOODFLOW_SERVIR_MEDIA', '1').lower() in ('1', 'true')
+
+# Eventos en vivo (SSE) para cocina y meseros. Solo se activan bajo ASGI: con un solo
+# worker alcanza el backend en memoria; con varios hace falta 'core.eventos.PostgresBackend'
+# (LISTEN/NOTIFY), si no las pantallas siguen con el polling.
+FOODFLOW_EVENTOS_BACKEND = os.environ.get('FOODFLOW_EVENTOS_BACKEND', 'core.eventos.MemoriaBackend')
+
+# API de las tablets en vistas async (core/urls.py). Lo activa start_asgi.sh (uvicorn).
+FOODFLOW_ASGI = os.environ.get('FOODFLOW_ASGI', '').lower() in ('1', 'true')
+# Workers del servidor web (start_asgi.sh exporta WEB_CONCURRENCY)
+FOODFLOW_WORKERS = int(os.environ.get('WEB_CONCURRENCY') or 1)
+
+
+# Métricas de rendimiento por vista (core/middleware.py).
+# Se avisa en el log 'core.rendimiento' cuando una vista supera su presupuesto.
+# Medidos con la caché por defecto (en memoria): usuario, roles y versiones salen de
+# la BD, hasta 3 consultas por petición que con CACHE_URL compartida no se hacen.
+FOODFLOW_PRESUPUESTOS = {
+    'cocina': {'consultas': 8, 'ms': 200},
+    'cocina_feed': {'consultas': 6, 'ms': 100},
+    'cocina_estacion': {'consultas': 9, 'ms': 200},
+    'cocina_estacion_feed': {'consultas': 7, 'ms': 100},
+    'ticket_listo': {'consultas': 12, 'ms': 100},
+    'mesero': {'consultas': 8, 'ms': 200},
+    # Usuario, roles, versión y el menú si no está en caché (304: 3); ver MenuEtagTests
+    'menu': {'consultas': 5, 'ms': 100},
+    # 15 con Idempotency-Key y tickets por estación (el resumen lo suma el worker)
+    'crear_pedido': {'consultas': 16, 'ms': 250},
+    'marcar_listo': {'consultas': 10, 'ms': 100},
+    # Usuario, versión y mesas (el 304 no lee las mesas); ver MapaMesasTests.test_consultas_del_mapa
+    'mapa_mesas': {'consultas': 3, 'ms': 50},
+    'reporte_ventas': {'consultas': 8, 'ms': 300},
+    'procesar_pago': {'consultas': 12, 'ms': 200},
+}
+FOODFLOW_METRICAS_TOKEN = os.environ.get('FOODFLOW_METRICAS_TOKEN', '')
 
-STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
+# Pedidos pagados hace más de estos días pasan a las tablas de archivo (manage.py archivar_pedidos)
+FOODFLOW_ARCHIVO_DIAS = int(os.environ.get('FOODFLOW_ARCHIVO_DIAS', 180))
 
-# Esto activa WhiteNoise para que los estilos funcionen en internet
-# STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
-STATICFILES_STORAGE = 'whitenoise.storage.CompressedStaticFilesStorage'
\ No newline at end of file
+# Cola de trabajos (core/trabajos.py): la petición solo encola y los corre start_worker.sh,
+# un servicio aparte del web (sin él no se actualiza el resumen de ventas).
+# En desarrollo (DEBUG), sin worker, corren en el mismo proceso al confirmar la transacción;
+# FOODFLOW_TRABAJOS_EN_LINEA=1/0 lo fuerza.
+FOODFLOW_TRABAJOS_EN_LINEA = os.environ.get('FOODFLOW_TRABAJOS_EN_LINEA', '1' if DEBUG else '0').lower() in ('1', 'true')
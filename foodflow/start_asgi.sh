@@ -0,0 +1,35 @@
+#!/usr/bin/env bash
+# Arranque ASGI: gunicorn con workers de uvicorn.
+# Cada worker es un event loop: atiende cientos de tablets a la vez (API async y SSE)
+# en vez de hacer cola detrás de unos pocos workers sync.
+set -o errexit
+
+export FOODFLOW_ASGI=1
+# Bajo ASGI las conexiones persistentes se acumulan (una por hilo de petición):
+# cada petición cierra la suya, o se usa el pool (DB_POOL=1, ver foodflowdatos/database.py)
+export DB_CONN_MAX_AGE="${DB_CONN_MAX_AGE:-0}"
+
+# Un worker por defecto: un solo event loop ya atiende cientos de tablets.
+# Con más, cada uno tiene su caché y sus eventos en memoria: hace falta CACHE_URL
+# compartida (redis/memcached/file) y FOODFLOW_EVENTOS_BACKEND=core.eventos.PostgresBackend
+# El número llega a settings (FOODFLOW_WORKERS): con uno, los eventos en vivo van en memoria
+WORKERS="${WEB_CONCURRENCY:-1}"
+export WEB_CONCURRENCY="$WORKERS"
+if [ "$WORKERS" -gt 1 ]; then
+    case "${CACHE_URL:-}" in
+        redis://*|rediss://*|memcached://*|file://*) ;;
+        *) echo "start_asgi.sh: WEB_CONCURRENCY=$WORKERS necesita CACHE_URL compartida (redis, memcached o file)." >&2; exit 1 ;;
+    esac
+    if [ "${FOODFLOW_EVENTOS_BACKEND:-}" != "core.eventos.PostgresBackend" ]; then
+        echo "start_asgi.sh: WEB_CONCURRENCY=$WORKERS necesita FOODFLOW_EVENTOS_BACKEND=core.eventos.PostgresBackend." >&2
+        exit 1
+    fi
+fi
+
+exec gunicorn foodflowdatos.asgi:application \
+    --worker-class uvicorn.workers.UvicornWorker \
+    --workers "$WORKERS" \
+    --bind "0.0.0.0:${PORT:-8000}" \
+    --timeout 60 \
+    --graceful-timeout 30 \
+    --keep-alive 5
@@ -0,0 +1,10 @@
+#!/usr/bin/env bash
+# Worker de la cola de trabajos (core/trabajos.py): resumen de ventas, miniaturas y
+# archivo nocturno. Va como un servicio aparte del web (en Render, un Background Worker
+# con el mismo build.sh y este script como comando de inicio); se pueden correr varios.
+#
+# En producción el web solo encola: sin este servicio el reporte de ventas no se
+# actualiza. Solo en desarrollo (DEBUG) los trabajos corren en la misma petición.
+set -o errexit
+
+exec python manage.py procesar_trabajos